@@ -7,9 +7,10 @@ import pandas as pd
 from injector import Injector
 from zipline.data import bundles as bundles_module
 
+from estimize.dataset_graph import DatasetGraph
 from estimize.di.default_module import DefaultModule
-from estimize.services import AssetInfoService, EstimatesService, ReleasesService, \
-    EstimizeConsensusService, EstimizeSignalService, MarketCapService, FactorService
+from estimize.services import AssetInfoService, CacheService, EstimatesService, ReleasesService, \
+    EstimizeConsensusService, EstimizeSignalService, MarketCapService, FactorService, ResidualReturnsService
 
 
 @click.group()
@@ -34,31 +35,59 @@ def init():
     factor_serivce = injector.get(FactorService)
     market_cap_service = injector.get(MarketCapService)
     releases_service = injector.get(ReleasesService)
+    residual_returns_service = injector.get(ResidualReturnsService)
 
     missing_csv_warning = 'Make sure you have added {} to your ./data directory.'
     remote_csv_warning = 'There was an issue downloading {}, make sure you are connected to the internet.'
 
-    actions = [
-        ('instruments.csv', asset_info_service.get_asset_info, missing_csv_warning),
-        ('estimates.csv', estimates_service.get_estimates, missing_csv_warning),
-        ('consensus.csv', estimize_consensus_service.get_final_consensuses, missing_csv_warning),
-        ('signal_time_series.csv', estimize_signal_service.get_signals, missing_csv_warning),
-        ('market_factors.csv', factor_serivce.get_market_factors, remote_csv_warning),
-        ('market_caps.csv', market_cap_service.get_market_caps, remote_csv_warning),
-        ('releases.csv', releases_service.get_releases, missing_csv_warning),
-    ]
-
-    def item_show_func(item):
-        if item is not None:
-            return 'Caching {}'.format(item[0])
-
-    with click.progressbar(actions, label='Caching Estimize Data', item_show_func=item_show_func) as items:
-        for item in items:
-            try:
-                item[1]()
-            except:
-                print('\nERROR: {}'.format(item[2].format(item[0])))
-                traceback.print_exc()
+    warnings = {
+        'asset_info': ('instruments.csv', missing_csv_warning),
+        'estimates': ('estimates.csv', missing_csv_warning),
+        'estimize_consensuses': ('consensus.csv', missing_csv_warning),
+        'estimize_final_consensuses': ('consensus.csv', missing_csv_warning),
+        'estimize_signals': ('signal_time_series.csv', missing_csv_warning),
+        'market_factors': ('market_factors.csv', remote_csv_warning),
+        'market_caps': ('market_caps.csv', remote_csv_warning),
+        'releases': ('releases.csv', missing_csv_warning),
+        'residual_returns': ('market_factors.csv', remote_csv_warning),
+    }
+
+    # Datasets already cached under their current fingerprint are skipped, independent ones build in parallel
+    graph = DatasetGraph(injector.get(CacheService))
+    graph.add('asset_info', asset_info_service.get_asset_info, key=lambda: asset_info_service.cache_key)
+    graph.add('estimates', estimates_service.get_estimates, key=lambda: estimates_service.cache_key)
+    graph.add(
+        'estimize_consensuses',
+        estimize_consensus_service.get_consensuses,
+        key=lambda: estimize_consensus_service.consensuses_cache_key
+    )
+    graph.add(
+        'estimize_final_consensuses',
+        estimize_consensus_service.get_final_consensuses,
+        inputs=['estimize_consensuses'],
+        key=lambda: estimize_consensus_service.final_consensuses_cache_key
+    )
+    graph.add('estimize_signals', estimize_signal_service.get_signals, key=lambda: estimize_signal_service.cache_key)
+    graph.add('market_factors', factor_serivce.get_market_factors, key=lambda: factor_serivce.cache_key)
+    graph.add('market_caps', market_cap_service.get_market_caps, key=lambda: market_cap_service.cache_key)
+    graph.add('releases', releases_service.get_releases, inputs=['asset_info'], key=lambda: releases_service.cache_key)
+    graph.add(
+        'residual_returns',
+        residual_returns_service.get_market_neutral_residual_returns,
+        inputs=['market_factors'],
+        key=lambda: residual_returns_service.cache_key
+    )
+
+    with click.progressbar(length=len(graph.nodes), label='Caching Estimize Data') as bar:
+        def on_done(name, error):
+            bar.update(1)
+
+            if error is not None:
+                filename, warning = warnings[name]
+                print('\nERROR: {}'.format(warning.format(filename)))
+                traceback.print_exception(type(error), error, error.__traceback__)
+
+        graph.build(callback=on_done)
 
 
 @main.command()
@@ -71,15 +100,12 @@ def update():
 def load_data():
     print('Loading data...')
     from zipline.data.bundles import register
+    from estimize.services.impl.zipline import YahooConfig
     from estimize.zipline.data.bundles.yahoo import yahoo_bundle
 
-    tickers = {
-        'SPY',
-    }
-
     register(
         'yahoo',
-        yahoo_bundle(tickers),
+        yahoo_bundle(YahooConfig.YAHOO_TICKERS, first_sid=YahooConfig.FIRST_SID),
     )
 
     bundles_module.ingest(
@@ -8,9 +8,32 @@ S3_DATA_BUCKET = 'com.estimize.production.data'
 CURRENT_QUARTER = '2018q1'
 ROOT_DATA_URL = 'https://s3.amazonaws.com/{}/research/{}'.format(S3_DATA_BUCKET, CURRENT_QUARTER)
 
+# 'columnar' stores one memory-mapped .npy file per column and reads date, asset and column subsets without
+# loading the rest, 'hdf5' one .h5 file per dataset that is always read whole
+CACHE_FORMAT = 'columnar'
+# Bytes of cached datasets kept in memory per process, least recently used first out
+CACHE_MEMORY_BUDGET = 2 * 1024 ** 3
+# Fetch datasets missing from the local cache from S3 before building them from the raw CSV files
+CACHE_READ_THROUGH = True
+# S3 compatible endpoint serving S3_DATA_BUCKET, None for AWS itself
+S3_ENDPOINT_URL = os.environ.get('ESTIMIZE_S3_ENDPOINT_URL')
+# Processes parsing large CSV files, None for one per CPU and 1 to parse them in process
+CSV_PARSE_PROCESSES = None
+# Times an interrupted download of a raw CSV file is resumed before giving up
+DOWNLOAD_RETRIES = 5
+# Index service frames by naive datetime64 dates and integer sids instead of date and Equity objects
+COMPACT_INDEX = False
+# Sessions per zipline pipeline run, longer date ranges are run in chunks to bound memory
+PIPELINE_CHUNK_SESSIONS = 252
+
 
 def data_dir():
     if os.path.basename(os.getcwd()) == 'notebooks':
         return os.path.join(os.getcwd(), os.pardir, 'data')
     else:
         return os.path.join(os.getcwd(), 'data')
+
+
+def download_dir():
+    # Kept across runs, so a download interrupted along with the process resumes on the next one
+    return os.path.join(data_dir(), 'downloads')
@@ -0,0 +1,104 @@
+import logging
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+logger = logging.getLogger(__name__)
+
+
+class DatasetGraph:
+    """Builds cached datasets in dependency order, running independent datasets in parallel.
+
+    Every dataset declares the datasets it is derived from (``inputs``). A dataset whose ``key`` (a callable
+    returning its versioned cache key) is already in ``cache_service`` is skipped without being loaded, so
+    only the datasets whose fingerprint changed, and therefore the ones derived from them, are rebuilt.
+    """
+
+    def __init__(self, cache_service=None, max_workers=4):
+        self.cache_service = cache_service
+        self.max_workers = max_workers
+        self.nodes = OrderedDict()
+
+    def add(self, name, build, inputs=(), key=None):
+        for input_name in inputs:
+            if input_name not in self.nodes:
+                raise ValueError("Unknown input '{}' for dataset '{}'".format(input_name, name))
+
+        self.nodes[name] = self.Node(name, build, inputs, key)
+
+        return self
+
+    def build(self, names=None, callback=None):
+        """Builds ``names`` (default all datasets) and their inputs.
+
+        Returns a dict of dataset name to the exception that failed it, or None. Datasets whose inputs failed
+        are not built. ``callback(name, error)`` is called as soon as each dataset is done.
+        """
+        nodes = self.subgraph(names)
+        results = OrderedDict()
+        pending = OrderedDict((node.name, node) for node in nodes)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                for name, node in list(pending.items()):
+                    failed = [n for n in node.inputs if results.get(n, None) is not None]
+
+                    if failed:
+                        del pending[name]
+                        self._done(results, name, RuntimeError('Inputs {} failed'.format(failed)), callback)
+                    elif all(n in results for n in node.inputs):
+                        del pending[name]
+                        running[executor.submit(self._build, node)] = name
+
+                if not running:
+                    continue
+
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    self._done(results, running.pop(future), future.exception(), callback)
+
+        return results
+
+    def subgraph(self, names=None):
+        """Returns ``names`` and everything they are derived from, inputs first"""
+        if names is None:
+            return list(self.nodes.values())
+
+        selected = set()
+        stack = list(names)
+
+        while stack:
+            name = stack.pop()
+
+            if name not in selected:
+                selected.add(name)
+                stack.extend(self.nodes[name].inputs)
+
+        return [node for name, node in self.nodes.items() if name in selected]
+
+    def _build(self, node):
+        if node.key is not None and self.cache_service is not None and self.cache_service.exists(node.key()):
+            logger.debug('build: {} is up to date'.format(node.name))
+            return
+
+        logger.info('build: building {}'.format(node.name))
+        node.build()
+
+    @staticmethod
+    def _done(results, name, error, callback):
+        if error is not None:
+            logger.error('build: {} failed ({})'.format(name, error))
+
+        results[name] = error
+
+        if callback is not None:
+            callback(name, error)
+
+    class Node:
+
+        def __init__(self, name, build, inputs, key):
+            self.name = name
+            self.build = build
+            self.inputs = tuple(inputs)
+            self.key = key
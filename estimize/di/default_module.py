@@ -4,13 +4,15 @@ from estimize.services import (
     AssetService, AssetInfoService, CacheService, CalendarService, CsvDataService, EstimizeConsensusService,
     EstimizeSignalService, EventStudyService, FactorService,
     MarketCapService,
-    EstimatesService, ReleasesService)
+    EstimatesService, ReleasesService, ResidualReturnsService, SymbolService)
 from estimize.services.impl import (
     AssetInfoServiceDefaultImpl, CacheServiceDefaultImpl, EstimizeConsensusServiceDefaultImpl,
     EstimizeSignalServiceDefaultImpl, EventStudyServiceDefaultImpl, FactorServiceDefaultImpl,
-    MarketCapServiceDefaultImpl, EstimatesServiceDefaultImpl, ReleasesServiceDefaultImpl)
+    MarketCapServiceDefaultImpl, EstimatesServiceDefaultImpl, ReleasesServiceDefaultImpl,
+    ResidualReturnsServiceDefaultImpl)
 from estimize.services.impl.zipline import (
-    Config, YahooConfig, AssetServiceZiplineImpl, CalendarServiceZiplineImpl, CsvDataServiceZiplineImpl
+    Config, YahooConfig, AssetServiceZiplineImpl, CalendarServiceZiplineImpl, CsvDataServiceZiplineImpl,
+    SymbolServiceZiplineImpl
 )
 
 
@@ -31,3 +33,5 @@ class DefaultModule(Module):
         binder.bind(FactorService, to=FactorServiceDefaultImpl, scope=singleton)
         binder.bind(MarketCapService, to=MarketCapServiceDefaultImpl, scope=singleton)
         binder.bind(ReleasesService, to=ReleasesServiceDefaultImpl, scope=singleton)
+        binder.bind(ResidualReturnsService, to=ResidualReturnsServiceDefaultImpl, scope=singleton)
+        binder.bind(SymbolService, to=SymbolServiceZiplineImpl, scope=singleton)
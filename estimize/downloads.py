@@ -0,0 +1,164 @@
+import hashlib
+import http.client
+import logging
+import os
+import re
+import time
+import urllib.error
+import urllib.request
+
+import estimize.config as cfg
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from the connection and written to the staging file at a time
+CHUNK_BYTES = 1024 ** 2
+# ETags of single part S3 uploads and of the test server are the MD5 of the content
+MD5_ETAG = re.compile(r'^"?([0-9a-f]{32})"?$')
+
+
+class DownloadError(Exception):
+    pass
+
+
+def download(url, path, retries=cfg.DOWNLOAD_RETRIES, timeout=60, chunk_bytes=CHUNK_BYTES):
+    """Streams ``url`` to ``path`` through a ``.part`` staging file next to it, returns ``path``.
+
+    A download cut short is resumed with a range request where it stopped, up to ``retries`` times, and
+    also by a later call when the process itself was interrupted. The ETag the staging file was started
+    with is kept in a ``.etag`` file, a resource that changed since is downloaded again from the start.
+    The length of the file is checked against the one announced by the server and, when the ETag is an
+    MD5, its content too, before it is moved to ``path``.
+    """
+    staging = '{}.part'.format(path)
+    etag_path = '{}.etag'.format(staging)
+    attempt = 0
+
+    while True:
+        try:
+            total, etag = _fetch(url, staging, etag_path, timeout, chunk_bytes)
+            break
+        except (OSError, http.client.HTTPException) as ex:
+            if isinstance(ex, urllib.error.HTTPError) and ex.code < 500 and ex.code != 416:
+                raise
+
+            attempt += 1
+
+            if attempt > retries:
+                raise DownloadError('Unable to download {} after {} attempts'.format(url, attempt)) from ex
+
+            logger.warning('download: {} interrupted at {} bytes ({}), resuming'.format(url, _size(staging), ex))
+
+            if isinstance(ex, urllib.error.HTTPError) and ex.code == 416:
+                # The staging file is longer than the resource, it can't be resumed
+                _remove(staging, etag_path)
+
+            time.sleep(min(2 ** (attempt - 1), 30))
+
+    size = _size(staging)
+
+    if total is not None and size != total:
+        _remove(staging, etag_path)
+        raise DownloadError('Downloaded {} bytes of {} instead of {}'.format(size, url, total))
+
+    content_md5 = md5_etag(etag)
+
+    if content_md5 is not None and md5(staging) != content_md5:
+        _remove(staging, etag_path)
+        raise DownloadError('Content of {} does not match its ETag {}'.format(url, etag))
+
+    os.replace(staging, path)
+    _remove(etag_path)
+
+    return path
+
+
+def _fetch(url, staging, etag_path, timeout, chunk_bytes):
+    """Appends the rest of ``url`` to ``staging``, returns the total length and ETag announced by the server"""
+    offset = _size(staging)
+    stored_etag = _read(etag_path) if offset > 0 else None
+    headers = {}
+
+    if stored_etag is not None:
+        headers = {'Range': 'bytes={}-'.format(offset), 'If-Range': stored_etag}
+
+    with urllib.request.urlopen(urllib.request.Request(url, headers=headers), timeout=timeout) as response:
+        etag = response.headers.get('ETag')
+        resumed = response.status == 206
+
+        if resumed and etag != stored_etag:
+            # Servers ignoring If-Range resume a resource that changed since, it is downloaded again instead
+            _remove(staging, etag_path)
+            raise http.client.HTTPException('{} changed since the download started'.format(url))
+
+        if resumed:
+            total = int(response.headers['Content-Range'].split('/')[-1])
+        else:
+            # Servers answer with the whole resource when it changed or doesn't support ranges
+            offset = 0
+            length = response.headers.get('Content-Length')
+            total = int(length) if length is not None else None
+
+            with open(etag_path, 'w') as f:
+                f.write(etag or '')
+
+        logger.info('download: {} from byte {} of {}'.format(url, offset, total))
+
+        with open(staging, 'ab' if resumed else 'wb') as f:
+            progress = 0
+
+            while True:
+                chunk = response.read(chunk_bytes)
+
+                if not chunk:
+                    break
+
+                f.write(chunk)
+
+                if total:
+                    done = int(10 * f.tell() / total)
+
+                    if done > progress:
+                        progress = done
+                        logger.info('download: {}% of {}'.format(10 * done, url))
+
+            # Reads return nothing rather than raise when the connection drops early
+            if total is not None and f.tell() < total:
+                raise http.client.IncompleteRead(b'', total - f.tell())
+
+    return total, etag
+
+
+def md5_etag(etag):
+    """The MD5 an ETag is made of, None for ETags that aren't one like those of multipart uploads"""
+    match = MD5_ETAG.match(etag or '')
+
+    return match.group(1) if match is not None else None
+
+
+def md5(path):
+    md5 = hashlib.md5()
+
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_BYTES), b''):
+            md5.update(chunk)
+
+    return md5.hexdigest()
+
+
+def _read(path):
+    if not os.path.exists(path):
+        return None
+
+    with open(path) as f:
+        return f.read() or None
+
+
+def _size(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def _remove(*paths):
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,72 @@
+import io
+import multiprocessing as mp
+import os
+
+import pandas as pd
+import pathos.pools as pp
+
+# Files are parsed in ranges of about this many bytes, a file smaller than that is parsed in one piece
+CHUNK_BYTES = 64 * 1024 ** 2
+
+
+def read_csv(path, processes=None, pre_func=None, chunk_bytes=CHUNK_BYTES, **kwargs) -> pd.DataFrame:
+    """``pd.read_csv`` of the file at ``path``, parsed by several processes.
+
+    The file is split at line boundaries into ranges of about ``chunk_bytes``. Each range is parsed along with
+    the header line by one of the ``processes`` (default one per CPU, 1 to parse in process), which also
+    applies ``pre_func`` to it, and the chunks are concatenated in file order with a fresh index. ``kwargs``
+    go to ``pd.read_csv``, fields must not contain line breaks.
+    """
+    header, ranges = _line_ranges(path, chunk_bytes)
+    tasks = [(path, header, start, end, pre_func, kwargs) for start, end in ranges]
+
+    processes = mp.cpu_count() if processes is None else processes
+
+    if processes > 1 and len(tasks) > 1:
+        pool = pp.ProcessPool(min(processes, len(tasks)))
+
+        try:
+            dfs = pool.map(_read_range, tasks)
+        finally:
+            pool.close()
+            pool.join()
+            pool.clear()
+    else:
+        dfs = [_read_range(task) for task in tasks]
+
+    return dfs[0] if len(dfs) == 1 else pd.concat(dfs, ignore_index=True)
+
+
+def _line_ranges(path, chunk_bytes):
+    size = os.path.getsize(path)
+
+    with open(path, 'rb') as f:
+        header = f.readline()
+        starts = [f.tell()]
+
+        while starts[-1] + chunk_bytes < size:
+            # Ranges end with the line the boundary falls in
+            f.seek(starts[-1] + chunk_bytes)
+            f.readline()
+
+            if f.tell() >= size:
+                break
+
+            starts.append(f.tell())
+
+    return header, list(zip(starts, starts[1:] + [size]))
+
+
+def _read_range(task):
+    path, header, start, end, pre_func, kwargs = task
+
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    df = pd.read_csv(io.BytesIO(header + data), **kwargs)
+
+    if pre_func:
+        df = pre_func(df)
+
+    return df
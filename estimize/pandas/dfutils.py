@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 import estimize.config as cfg
 
@@ -5,20 +6,144 @@ ASSET_COLUMN = 'asset'
 
 
 def filter(df: pd.DataFrame, start_date=None, end_date=None, assets=None) -> pd.DataFrame:
+    dates = df.index.get_level_values('as_of_date') if start_date is not None or end_date is not None else None
+
     if start_date is not None:
-        start_date = pd.Timestamp(start_date, tz=cfg.DEFAULT_TIMEZONE)
-        df = df.iloc[df.index.get_level_values('as_of_date') >= start_date]
+        start_date = _date_bound(start_date, dates)
+        df = df.iloc[dates >= start_date]
+        dates = df.index.get_level_values('as_of_date')
 
     if end_date is not None:
-        end_date = pd.Timestamp(end_date, tz=cfg.DEFAULT_TIMEZONE)
-        df = df.iloc[df.index.get_level_values('as_of_date') <= end_date]
+        end_date = _date_bound(end_date, dates)
+        df = df.iloc[dates <= end_date]
 
     if assets is not None:
-        df = df.iloc[df.index.get_level_values('asset').isin(assets)]
+        values = df.index.get_level_values('asset')
+
+        # Compact frames are indexed by sid, assets can be given either way
+        if values.dtype.kind in 'iu':
+            assets = to_sids(assets)
+
+        df = df.iloc[values.isin(assets)]
+
+    return df
+
+
+def to_datetime_level(df, level='as_of_date'):
+    """Returns ``df`` with its ``level`` index level as naive datetime64, only the unique values are converted"""
+    df = df.copy(deep=False)
+
+    if isinstance(df.index, pd.MultiIndex):
+        i = df.index.names.index(level)
+        df.index = df.index.set_levels(pd.DatetimeIndex(pd.to_datetime(df.index.levels[i])), level=i)
+    else:
+        df.index = pd.DatetimeIndex(pd.to_datetime(df.index), name=df.index.name)
+
+    return df
+
+
+def as_of_date_level(df, level='as_of_date'):
+    """Returns ``df`` with its ``level`` index level converted by ``as_of_dates``, only the unique values are
+    converted"""
+    df = df.copy(deep=False)
+    df.index = _map_level(df.index, level, lambda values: pd.Index(as_of_dates(values)))
 
     return df
 
 
+def to_datetime(values, format=None) -> pd.DatetimeIndex:
+    """Same as ``pd.to_datetime`` for an array of strings, parsing every distinct value only once"""
+    codes, uniques = pd.factorize(np.asarray(values))
+    dates = np.append(pd.to_datetime(uniques, format=format).values, np.datetime64('NaT'))
+
+    # Missing values have code -1, which picks the trailing NaT
+    return pd.DatetimeIndex(dates[codes])
+
+
+def to_date(values) -> np.ndarray:
+    """Python ``date`` objects of the local dates of ``values``, without going through ``Timestamp`` objects"""
+    values = pd.DatetimeIndex(values)
+
+    if values.tz is not None:
+        values = values.tz_localize(None)
+
+    return values.values.astype('datetime64[D]').astype(object)
+
+
+def compact_index(df):
+    """Returns ``df`` indexed by naive datetime64 dates and int sids when ``cfg.COMPACT_INDEX`` is set.
+
+    Dates are the local calendar dates of the ``as_of_date`` level and assets the sids of the ``asset``
+    level, so joins and groupbys hash integers rather than Python objects. Only the unique values of each
+    level are converted. ``df`` is returned as is otherwise.
+    """
+    if not cfg.COMPACT_INDEX:
+        return df
+
+    df = df.copy(deep=False)
+
+    if 'as_of_date' in df.index.names:
+        df.index = _map_level(df.index, 'as_of_date', _to_dates)
+
+    if ASSET_COLUMN in df.index.names:
+        df.index = _map_level(df.index, ASSET_COLUMN, lambda values: pd.Index(to_sids(values)))
+
+    return df
+
+
+def as_of_dates(values):
+    """Local calendar dates of ``values`` as ``as_of_date`` level values, naive datetime64 when ``cfg.COMPACT_INDEX``
+    is set and ``date`` objects otherwise"""
+    return _to_dates(values) if cfg.COMPACT_INDEX else to_date(values)
+
+
+def to_sids(assets) -> np.ndarray:
+    """Sids of ``assets``, which can be assets or sids already"""
+    return np.array([getattr(asset, 'sid', asset) for asset in assets], dtype=np.int64)
+
+
+def asset_key(asset):
+    """The value ``asset`` has in the ``asset`` index level of service frames"""
+    return asset.sid if cfg.COMPACT_INDEX else asset
+
+
+def _to_dates(values):
+    dates = pd.DatetimeIndex(pd.to_datetime(values))
+
+    if dates.tz is not None:
+        dates = dates.tz_localize(None)
+
+    return dates.normalize()
+
+
+def _map_level(index, name, func):
+    """``index`` with ``func`` applied to the unique values of its ``name`` level"""
+    if not isinstance(index, pd.MultiIndex):
+        return pd.Index(func(index), name=name)
+
+    i = index.names.index(name)
+    values = func(index.levels[i])
+
+    if values.is_unique:
+        return index.set_levels(values, level=i)
+
+    # Values that became equal, like times of the same day, can't stay separate level values
+    values = values.take(index.levels[i].get_indexer(index.get_level_values(i)))
+    arrays = [values if j == i else index.get_level_values(j) for j in range(index.nlevels)]
+
+    return pd.MultiIndex.from_arrays(arrays, names=index.names)
+
+
+def _date_bound(date, dates):
+    date = pd.Timestamp(date, tz=cfg.DEFAULT_TIMEZONE)
+
+    # Naive datetime64 dates are compared on the local calendar date
+    if isinstance(dates, pd.DatetimeIndex) and dates.tz is None:
+        date = date.tz_localize(None)
+
+    return date
+
+
 def unique_assets(df):
     return column_values(df, ASSET_COLUMN).unique().tolist()
 
@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from estimize.pandas import csvutils
+
+
+class TestReadCsv(unittest.TestCase):
+
+    def setUp(self):
+        random = np.random.RandomState(0)
+        self.df = pd.DataFrame({
+            'ticker': random.choice(['AAPL', 'MSFT', 'IBM'], 5000),
+            'value': random.randn(5000),
+            'count': random.randint(0, 10, 5000)
+        }, columns=['ticker', 'value', 'count'])
+
+        fd, self.path = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+        self.df.to_csv(self.path, index=False)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_chunks_match_a_single_read(self):
+        for processes in (1, 3):
+            df = csvutils.read_csv(self.path, processes=processes, chunk_bytes=4096)
+
+            pd.util.testing.assert_frame_equal(df, pd.read_csv(self.path))
+
+    def test_pre_func_and_kwargs_apply_to_every_chunk(self):
+        def pre_func(df):
+            df['value'] *= 2
+            return df
+
+        df = csvutils.read_csv(self.path, processes=1, pre_func=pre_func, chunk_bytes=1000,
+                               usecols=['ticker', 'value'], dtype={'value': np.float32})
+
+        expected = pd.read_csv(self.path, usecols=['ticker', 'value'], dtype={'value': np.float32})
+        expected['value'] *= 2
+
+        pd.util.testing.assert_frame_equal(df, expected)
+
+    def test_ranges_split_at_line_boundaries(self):
+        header, ranges = csvutils._line_ranges(self.path, 1000)
+
+        with open(self.path, 'rb') as f:
+            data = f.read()
+
+        self.assertEqual(header, data[:len(header)])
+        self.assertEqual(ranges[0][0], len(header))
+        self.assertEqual(ranges[-1][1], len(data))
+
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, start)
+            self.assertEqual(data[start - 1:start], b'\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import datetime
+import unittest
+
+import numpy as np
+import pandas as pd
+
+import estimize.config as cfg
+from estimize.pandas import dfutils
+
+
+class Asset:
+
+    def __init__(self, sid):
+        self.sid = sid
+
+    def __eq__(self, other):
+        return isinstance(other, Asset) and self.sid == other.sid
+
+    def __hash__(self):
+        return self.sid
+
+
+class TestCompactIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.compact_index = cfg.COMPACT_INDEX
+        cfg.COMPACT_INDEX = True
+
+        self.assets = [Asset(24), Asset(5061)]
+        dates = [datetime.date(2017, 1, 3), datetime.date(2017, 1, 4)]
+        index = pd.MultiIndex.from_product([dates, self.assets], names=['as_of_date', 'asset'])
+        self.df = pd.DataFrame({'value': np.arange(4.0)}, index=index)
+
+    def tearDown(self):
+        cfg.COMPACT_INDEX = self.compact_index
+
+    def test_compact_index(self):
+        df = dfutils.compact_index(self.df)
+
+        self.assertEqual(df.index.get_level_values('as_of_date').dtype.kind, 'M')
+        self.assertEqual(df.index.get_level_values('asset').tolist(), [24, 5061, 24, 5061])
+        self.assertEqual(df.index.get_level_values('as_of_date')[2], pd.Timestamp('2017-01-04'))
+        self.assertEqual(df['value'].tolist(), self.df['value'].tolist())
+        self.assertIsInstance(self.df.index.get_level_values('asset')[0], Asset)
+
+    def test_compact_index_of_times(self):
+        times = pd.to_datetime(['2017-01-03 09:00', '2017-01-03 16:00', '2017-01-04 09:00']).tz_localize('US/Eastern')
+        index = pd.MultiIndex.from_arrays([times, self.assets + self.assets[:1]], names=['as_of_date', 'asset'])
+
+        df = dfutils.compact_index(pd.DataFrame({'value': np.arange(3.0)}, index=index))
+
+        expected = pd.to_datetime(['2017-01-03', '2017-01-03', '2017-01-04'])
+        self.assertEqual(df.index.get_level_values('as_of_date').tolist(), expected.tolist())
+        self.assertEqual(df.index.get_level_values('asset').tolist(), [24, 5061, 24])
+
+    def test_compact_index_disabled(self):
+        cfg.COMPACT_INDEX = False
+
+        self.assertIs(dfutils.compact_index(self.df), self.df)
+
+    def test_filter_by_assets_or_sids(self):
+        df = dfutils.compact_index(self.df)
+
+        for assets in ([self.assets[1]], [5061]):
+            filtered = dfutils.filter(df, start_date='2017-01-04', assets=assets)
+
+            self.assertEqual(filtered['value'].tolist(), [3.0])
+
+    def test_as_of_date_level(self):
+        times = pd.to_datetime(['2017-01-03 09:00', '2017-01-03 16:00', '2017-01-04 09:00'])
+        index = pd.MultiIndex.from_arrays([times, self.assets + self.assets[:1]], names=['as_of_date', 'asset'])
+        df = pd.DataFrame({'value': np.arange(3.0)}, index=index)
+
+        self.assertEqual(
+            dfutils.as_of_date_level(df).index.get_level_values('as_of_date').tolist(),
+            pd.to_datetime(['2017-01-03', '2017-01-03', '2017-01-04']).tolist()
+        )
+
+        cfg.COMPACT_INDEX = False
+        dates = dfutils.as_of_date_level(df).index.get_level_values('as_of_date')
+
+        self.assertEqual(dates.tolist(), [datetime.date(2017, 1, 3), datetime.date(2017, 1, 3), datetime.date(2017, 1, 4)])
+        self.assertIsInstance(dates[0], datetime.date)
+
+    def test_asset_key(self):
+        self.assertEqual(dfutils.asset_key(self.assets[0]), 24)
+
+        cfg.COMPACT_INDEX = False
+
+        self.assertIs(dfutils.asset_key(self.assets[0]), self.assets[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,3 +10,5 @@ from .event_study_service import EventStudyService
 from .factor_service import FactorService
 from .market_cap_service import MarketCapService
 from .releases_service import ReleasesService
+from .residual_returns_service import ResidualReturnsService
+from .symbol_service import SymbolService
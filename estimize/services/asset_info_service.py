@@ -3,6 +3,11 @@ from abc import abstractmethod
 
 class AssetInfoService:
 
+    @property
+    @abstractmethod
+    def cache_key(self) -> str:
+        raise NotImplementedError()
+
     @abstractmethod
     def get_asset_info(self, assets=None):
         raise NotImplementedError()
@@ -7,6 +7,11 @@ class AssetService:
     TIMEZONE = 'US/Eastern'
     ASSET_COLUMN = 'asset'
 
+    @property
+    @abstractmethod
+    def cache_key(self) -> str:
+        raise NotImplementedError()
+
     def get_asset(self, ticker):
         return self.get_assets([ticker])[0]
 
@@ -14,6 +19,10 @@ class AssetService:
     def get_assets(self, tickers):
         raise NotImplementedError()
 
+    @abstractmethod
+    def retrieve_assets(self, assets):
+        raise NotImplementedError()
+
     @abstractmethod
     def get_moving_average(self, start_date, end_date, assets=None, window_length=63):
         raise NotImplementedError()
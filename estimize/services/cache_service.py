@@ -5,9 +5,21 @@ import pandas as pd
 class CacheService:
 
     @abstractmethod
-    def get(self, key: str) -> pd.DataFrame:
+    def get(self, key: str, start_date=None, end_date=None, assets=None, columns=None) -> pd.DataFrame:
         raise NotImplementedError()
 
     @abstractmethod
     def put(self, key: str, df: pd.DataFrame):
         raise NotImplementedError()
+
+    @abstractmethod
+    def put_chunks(self, key: str, dfs):
+        raise NotImplementedError()
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def versioned_key(self, name: str, *sources) -> str:
+        raise NotImplementedError()
@@ -18,3 +18,27 @@ class CalendarService:
     @abstractmethod
     def get_trading_days_between(self, start_date, end_date):
         raise NotImplementedError()
+
+    @abstractmethod
+    def get_sessions(self):
+        """All sessions of the calendar as a sorted, tz-naive DatetimeIndex"""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def get_sessions_between(self, start_date, end_date):
+        raise NotImplementedError()
+
+    @abstractmethod
+    def get_session_ordinals(self, dates, side='left'):
+        """Positions of ``dates`` in ``get_sessions()``, as ``searchsorted`` would return them"""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def shift_sessions(self, dates, n):
+        """The n-th session after (n > 0) or before (n < 0) each of ``dates``, NaT past the calendar ends"""
+        raise NotImplementedError()
+
+    @abstractmethod
+    def snap_to_sessions(self, dates, direction='forward'):
+        """Each of ``dates`` if it is a session, else the next ('forward') or previous ('backward') session"""
+        raise NotImplementedError()
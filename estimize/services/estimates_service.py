@@ -1,7 +1,14 @@
+from abc import abstractmethod
+
 import pandas as pd
 
 
 class EstimatesService:
 
+    @property
+    @abstractmethod
+    def cache_key(self) -> str:
+        raise NotImplementedError()
+
     def get_estimates(self) -> pd.DataFrame:
         raise NotImplementedError()
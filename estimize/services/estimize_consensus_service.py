@@ -5,6 +5,16 @@ import pandas as pd
 
 class EstimizeConsensusService:
 
+    @property
+    @abstractmethod
+    def final_consensuses_cache_key(self) -> str:
+        raise NotImplementedError()
+
+    @property
+    @abstractmethod
+    def consensuses_cache_key(self) -> str:
+        raise NotImplementedError()
+
     @abstractmethod
     def get_final_consensuses(self, start_date=None, end_date=None, assets=None) -> pd.DataFrame:
         raise NotImplementedError()
@@ -5,6 +5,11 @@ import pandas as pd
 
 class EstimizeSignalService:
 
+    @property
+    @abstractmethod
+    def cache_key(self) -> str:
+        raise NotImplementedError()
+
     @abstractmethod
     def get_signals(self, start_date=None, end_date=None, assets=None) -> pd.DataFrame:
         raise NotImplementedError()
@@ -3,5 +3,9 @@ import pandas as pd
 
 class EventStudyService:
 
-    def run_event_study(self, events: pd.DataFrame, on='open', days_before=10, days_after=5) -> pd.DataFrame:
+    def run_event_study(self, events: pd.DataFrame, on='open', days_before=10, days_after=5, confidence=None,
+                        bootstrap_draws=1000, chunk_size=None) -> pd.DataFrame:
+        raise NotImplementedError()
+
+    def run_event_studies(self, studies: dict) -> dict:
         raise NotImplementedError()
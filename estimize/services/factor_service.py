@@ -1,7 +1,14 @@
+from abc import abstractmethod
+
 import pandas as pd
 
 
 class FactorService:
 
+    @property
+    @abstractmethod
+    def cache_key(self) -> str:
+        raise NotImplementedError()
+
     def get_market_factors(self, start_date=None, end_date=None, assets=None, use_cache=True) -> pd.DataFrame:
         raise NotImplementedError()
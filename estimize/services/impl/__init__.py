@@ -7,3 +7,4 @@ from .event_study_service_default_impl import EventStudyServiceDefaultImpl
 from .factor_service_default_impl import FactorServiceDefaultImpl
 from .market_cap_service_default_impl import MarketCapServiceDefaultImpl
 from .releases_service_default_impl import ReleasesServiceDefaultImpl
+from .residual_returns_service_default_impl import ResidualReturnsServiceDefaultImpl
@@ -16,20 +16,27 @@ class AssetInfoServiceDefaultImpl(AssetInfoService):
         self.csv_data_service = csv_data_service
         self.cache_service = cache_service
 
+    @property
+    def cache_key(self):
+        return self.cache_service.versioned_key('asset_info', self.filename, self._pre_func, self._post_func)
+
+    @property
+    def filename(self):
+        return os.path.join(cfg.data_dir(), 'instruments.csv')
+
     def get_asset_info(self, assets=None):
-        cache_key = 'asset_info'
-        df = self.cache_service.get(cache_key)
+        cache_key = self.cache_key
+        df = self.cache_service.get(cache_key, assets=assets)
 
         if df is None:
             df = self.csv_data_service.get_from_file(
-                filename=os.path.join(cfg.data_dir(), 'instruments.csv'),
+                filename=self.filename,
                 pre_func=self._pre_func,
                 post_func=self._post_func,
                 symbol_column='ticker'
             )
             self.cache_service.put(cache_key, df)
-
-        df = dfutils.filter(df, assets=assets)
+            df = dfutils.filter(df, assets=assets)
 
         return df
 
@@ -46,4 +53,4 @@ class AssetInfoServiceDefaultImpl(AssetInfoService):
         df.rename(columns={'sid': 'asset', 'id': 'instrument_id'}, inplace=True)
         df.set_index(['asset'], inplace=True)
 
-        return df
+        return dfutils.compact_index(df)
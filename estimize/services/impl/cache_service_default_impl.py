@@ -1,42 +1,314 @@
+import datetime
+import hashlib
+import inspect
+import logging
 import os
+import pickle
+import re
+import shutil
 import tempfile
+import threading
+import urllib.request
 from abc import abstractmethod
+from collections import OrderedDict
 
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore import UNSIGNED
 from botocore.client import Config
 import botocore
+import numpy as np
 import pandas as pd
 from memoized_property import memoized_property
 
 import estimize.config as cfg
+from estimize import downloads
+from estimize.pandas import dfutils
 from estimize.services.cache_service import CacheService
 
+logger = logging.getLogger(__name__)
+
+KEY_SEPARATOR = '@'
+KEY_PATTERN = re.compile(r'^[^@/]+@[0-9a-f]{16}$')
+# HDF5 (through PyTables) isn't thread safe, not even across files
+HDF5_LOCK = threading.RLock()
+
 
 class CacheServiceDefaultImpl(CacheService):
 
+    def __init__(self, cache_format=cfg.CACHE_FORMAT, memory_budget=cfg.CACHE_MEMORY_BUDGET, cache_dir=None,
+                 read_through=cfg.CACHE_READ_THROUGH, endpoint_url=None):
+        self.cache_format = cache_format
+        self.memory_budget = memory_budget
+        self.cache_dir = cache_dir
+        self.read_through = read_through
+        self.endpoint_url = endpoint_url
+        self.etags = {}
+        self.file_sources = {}
+        self.published = {}
+
     def put(self, key: str, df: pd.DataFrame):
         self.local_cache.put(key, df)
+        self._replace_versions(key)
+
+    def put_chunks(self, key: str, dfs):
+        """Stores the concatenation of the frames ``dfs`` yields, the columnar format writes them one at a time"""
+        self.local_cache.put_chunks(key, dfs)
+        self._replace_versions(key)
+
+    def _replace_versions(self, key):
+        self.memory_cache.invalidate(key)
+
+        # Older versions of the dataset can never be read again
+        for sibling in self._versions(key):
+            if sibling != key:
+                self.local_cache.remove(sibling)
+                self.memory_cache.invalidate(sibling)
+
+    def versioned_key(self, name: str, *sources) -> str:
+        """Returns ``name`` suffixed with a fingerprint of everything the dataset is built from.
+
+        ``sources`` can be local file paths (fingerprinted by size and modification time), URLs (by ETag),
+        functions (by source code, so changing a transform rebuilds the dataset) or any other value (by its
+        ``repr``). ``cfg.CURRENT_QUARTER`` is always part of the fingerprint, and so is ``cfg.COMPACT_INDEX``
+        when set. When a URL can't be reached the newest cached version of the dataset is used, so cached data
+        stays readable offline. The local files of ``sources`` are remembered, along with those of the keys of
+        other datasets among them, the published dataset is only read through when they are the published files.
+        """
+        fingerprint = hashlib.sha1(cfg.CURRENT_QUARTER.encode())
+        files = []
+
+        # Compact datasets are never published, they are always built locally (see get)
+        if cfg.COMPACT_INDEX:
+            fingerprint.update(b'compact_index')
+
+        for source in sources:
+            if isinstance(source, str) and source.startswith(('http://', 'https://')):
+                value = self._etag(source)
+
+                if value is None:
+                    versions = self._versions(name)
+
+                    if versions:
+                        return max(versions, key=lambda key: self.local_cache.version(key)[1])
+            elif isinstance(source, str) and os.path.isfile(source):
+                stat = os.stat(source)
+                value = (source, stat.st_size, stat.st_mtime_ns)
+                files = None if files is None else files + [source]
+            elif isinstance(source, str) and KEY_PATTERN.match(source):
+                # A dataset derived from another one is built from that one's files, None when they are unknown
+                value = source
+                nested = self.file_sources.get(source)
+                files = None if files is None or nested is None else files + nested
+            elif callable(source):
+                value = _source_code(source)
+            else:
+                value = source
+
+            fingerprint.update(repr(value).encode())
+
+        key = '{}{}{}'.format(name, KEY_SEPARATOR, fingerprint.hexdigest()[:16])
+        self.file_sources[key] = files
+
+        return key
+
+    def get(self, key: str, start_date=None, end_date=None, assets=None, columns=None) -> pd.DataFrame:
+        version = self.local_cache.version(key)
+
+        # Only a cache without any version of the dataset is seeded from the remote one, once a local
+        # version exists a new fingerprint means its inputs changed locally and it has to be rebuilt.
+        # Published datasets have the default index, not the compact one.
+        if version is None and self.read_through and not cfg.COMPACT_INDEX and not self._versions(key):
+            version = self._read_through(key)
+
+        if version is None:
+            self.memory_cache.invalidate(key)
+            return None
+
+        df = self.memory_cache.get(key, version)
+        filtered = any(arg is not None for arg in (start_date, end_date, assets, columns))
+
+        if df is None:
+            if filtered and self.local_cache.PUSHDOWN:
+                return self.local_cache.get(key, start_date, end_date, assets, columns)
+
+            df = self.local_cache.get(key)
+            self.memory_cache.put(key, version, df)
+
+        result = dfutils.filter(df, start_date, end_date, assets)
+
+        if columns is not None:
+            result = result[columns]
+
+        # Callers are free to modify what they get back, never hand out the cached frame itself
+        return result.copy() if result is df else result
+
+    def exists(self, key: str) -> bool:
+        return self.local_cache.exists(key)
+
+    def _read_through(self, key):
+        # Published datasets are built from the published files, a dataset of other files has to be built locally
+        files = self.file_sources.get(key, [])
+
+        if files is None:
+            logger.info('get: the source files of {} are unknown, building it locally'.format(key))
+            return None
+
+        unpublished = [path for path in files if not self._is_published(path)]
+
+        if unpublished:
+            logger.info('get: {} differ from the published files, building {} locally'.format(unpublished, key))
+            return None
+
+        try:
+            if not self.remote_cache.exists(key):
+                return None
 
-    def get(self, key: str) -> pd.DataFrame:
-        return self.local_cache.get(key)
+            logger.info('get: downloading {} from the remote cache'.format(key))
+
+            # Staged next to the local cache so it can be moved into place without another copy
+            fd, path = tempfile.mkstemp(suffix='.download', dir=self.local_cache.cache_dir)
+            os.close(fd)
+
+            try:
+                self.remote_cache.download(key, path)
+                self.local_cache.import_file(key, path)
+            finally:
+                if os.path.exists(path):
+                    os.remove(path)
+        except (botocore.exceptions.BotoCoreError, botocore.exceptions.ClientError) as ex:
+            logger.warning('get: remote cache unavailable, building datasets locally ({})'.format(ex))
+            self.read_through = False
+            return None
+
+        return self.local_cache.version(key)
+
+    def _versions(self, key):
+        name = key.split(KEY_SEPARATOR)[0]
+
+        return [k for k in self.local_cache.keys() if k.split(KEY_SEPARATOR)[0] == name]
+
+    def _is_published(self, path):
+        """Whether the local file at ``path`` has the content of the file of the same name published on S3"""
+        stat = os.stat(path)
+        version = (path, stat.st_size, stat.st_mtime_ns)
+
+        if version not in self.published:
+            content_md5 = downloads.md5_etag(self._etag(self.remote_cache.url(os.path.basename(path))))
+            self.published[version] = content_md5 is not None and downloads.md5(path) == content_md5
+
+        return self.published[version]
+
+    def _etag(self, url):
+        if url not in self.etags:
+            try:
+                with urllib.request.urlopen(urllib.request.Request(url, method='HEAD'), timeout=10) as response:
+                    self.etags[url] = response.headers.get('ETag') or response.headers.get('Last-Modified')
+            except OSError as ex:
+                logger.warning('versioned_key: unable to reach {} ({})'.format(url, ex))
+                self.etags[url] = None
+
+        return self.etags[url]
+
+    @memoized_property
+    def memory_cache(self):
+        return MemoryCache(self.memory_budget)
 
     @memoized_property
     def local_cache(self):
-        return LocalCache()
+        if self.cache_format == 'columnar':
+            return ColumnarCache(self.cache_dir)
+        elif self.cache_format == 'hdf5':
+            return LocalCache(self.cache_dir)
+        else:
+            raise ValueError("Unknown cache format '{}'".format(self.cache_format))
 
     @memoized_property
     def remote_cache(self):
-        return RemoteCache()
+        return RemoteCache(self.endpoint_url)
+
+
+class MemoryCache:
+    """In-process LRU tier holding whole datasets up to ``budget`` bytes.
+
+    Entries are tagged with the version of the file they were read from and are dropped as soon as the
+    file changes. ``hits`` and ``misses`` count lookups since the cache was created.
+    """
+
+    def __init__(self, budget):
+        self.budget = budget
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.items = OrderedDict()
+        self.lock = threading.RLock()
+
+    def get(self, key, version):
+        with self.lock:
+            item = self.items.get(key)
+
+            if item is not None and item[0] != version:
+                self.invalidate(key)
+                item = None
+
+            if item is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.items.move_to_end(key)
+
+            return item[1]
+
+    def put(self, key, version, df):
+        size = int(df.memory_usage(index=True).sum())
+
+        with self.lock:
+            self.invalidate(key)
+
+            if size > self.budget:
+                logger.debug('put: {} ({} bytes) exceeds the memory budget'.format(key, size))
+                return
+
+            while self.size + size > self.budget:
+                self.invalidate(next(iter(self.items)))
+
+            self.items[key] = (version, df, size)
+            self.size += size
+
+    def invalidate(self, key):
+        with self.lock:
+            item = self.items.pop(key, None)
+
+            if item is not None:
+                self.size -= item[2]
+
+    @property
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'items': len(self.items), 'bytes': self.size}
 
 
 class Cache:
 
-    def get(self, key):
+    PUSHDOWN = False
+
+    def exists(self, key):
+        return self.CacheItem(self, key).exists
+
+    def keys(self):
+        return []
+
+    def remove(self, key):
+        raise NotImplementedError()
+
+    def version(self, key):
+        return self.CacheItem(self, key).version
+
+    def get(self, key, start_date=None, end_date=None, assets=None, columns=None):
         item = self.CacheItem(self, key)
 
         if item.exists:
-            return item.df
+            return item.read(start_date, end_date, assets, columns)
         else:
             return None
 
@@ -44,6 +316,17 @@ class Cache:
         item = self.CacheItem(self, key)
         item.store(df)
 
+    def put_chunks(self, key, dfs):
+        # Formats that can't be appended to are written at once
+        self.put(key, pd.concat(list(dfs)))
+
+    def import_file(self, key, path):
+        """Stores the HDF5 dataset at ``path`` under ``key``, ``path`` may be moved or removed"""
+        with HDF5_LOCK:
+            df = pd.read_hdf(path)
+
+        self.put(key, df)
+
     class CacheItem(object):
 
         def __init__(self, cache, key):
@@ -64,12 +347,29 @@ class Cache:
         def store(self, payload):
             pass
 
+        @property
+        def version(self):
+            return None
+
+        def read(self, start_date=None, end_date=None, assets=None, columns=None):
+            df = dfutils.filter(self.df, start_date, end_date, assets)
+
+            if columns is not None:
+                df = df[columns]
+
+            return df
+
 
 class LocalCache(Cache):
 
+    def __init__(self, root_dir=None):
+        self.root_dir = root_dir
+
     @memoized_property
     def cache_dir(self):
-        if os.path.basename(os.getcwd()) == 'notebooks':
+        if self.root_dir is not None:
+            path = self.root_dir
+        elif os.path.basename(os.getcwd()) == 'notebooks':
             path = os.path.join(os.getcwd(), os.pardir, '.cache')
         else:
             path = os.path.join(os.getcwd(), '.cache')
@@ -79,6 +379,23 @@ class LocalCache(Cache):
 
         return path
 
+    def keys(self):
+        suffix = self.CacheItem(self, '').filename
+
+        return [filename[:-len(suffix)] for filename in os.listdir(self.cache_dir) if filename.endswith(suffix)]
+
+    def remove(self, key):
+        path = self.CacheItem(self, key).path
+
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.exists(path):
+            os.remove(path)
+
+    def import_file(self, key, path):
+        # Already in the storage format
+        os.rename(path, self.CacheItem(self, key).path)
+
     class CacheItem(Cache.CacheItem):
 
         def __init__(self, cache, key):
@@ -89,9 +406,14 @@ class LocalCache(Cache):
         def exists(self):
             return os.path.exists(self.path)
 
+        @property
+        def version(self):
+            return _file_version(self.path)
+
         @memoized_property
         def df(self):
-            return pd.read_hdf(self.path)
+            with HDF5_LOCK:
+                return pd.read_hdf(self.path)
 
         @memoized_property
         def path(self):
@@ -102,14 +424,368 @@ class LocalCache(Cache):
             return '{}.h5'.format(self.key)
 
         def store(self, df):
-            df.to_hdf(self.path, key='df', mode='w')
+            with HDF5_LOCK:
+                df.to_hdf(self.path, key='df', mode='w')
+
+
+class ColumnarCache(LocalCache):
+    """Stores every dataset as a directory holding one ``.npy`` file per column (index levels included).
+
+    Numeric and datetime columns are memory-mapped on read, object columns are dictionary encoded into
+    memory-mapped integer codes plus a small pickled table of unique values, and only the requested columns
+    are ever opened, so reads only touch the bytes that are actually used.
+
+    Datasets with an ``as_of_date`` index level are stored sorted by it, so a date range is read as one
+    contiguous slice of rows and an ``assets`` predicate is evaluated on the codes of that slice only.
+    """
+
+    PUSHDOWN = True
+
+    def import_file(self, key, path):
+        Cache.import_file(self, key, path)
+
+    def put_chunks(self, key, dfs):
+        self.CacheItem(self, key).store_chunks(dfs)
+
+    class CacheItem(Cache.CacheItem):
+
+        INDEX_COLUMN = '__index_level_{}__'
+        META_FILENAME = 'meta.pkl'
+
+        def __init__(self, cache, key):
+            self.cache = cache
+            self.key = key
+
+        @property
+        def exists(self):
+            return os.path.exists(os.path.join(self.path, self.META_FILENAME))
+
+        @property
+        def version(self):
+            return _file_version(os.path.join(self.path, self.META_FILENAME))
+
+        @property
+        def df(self):
+            return self.read()
+
+        @memoized_property
+        def path(self):
+            return os.path.join(self.cache.cache_dir, self.filename)
+
+        @memoized_property
+        def filename(self):
+            return '{}.columns'.format(self.key)
+
+        @memoized_property
+        def meta(self):
+            with open(os.path.join(self.path, self.META_FILENAME), 'rb') as f:
+                return pickle.load(f)
+
+        def read(self, start_date=None, end_date=None, assets=None, columns=None):
+            meta = self.meta
+            index_columns = [self.INDEX_COLUMN.format(i) for i in range(len(meta['index_names']))]
+
+            if columns is None:
+                columns = [spec['name'] for spec in meta['columns'][len(index_columns):]]
+
+            rows = self._rows(start_date, end_date, assets)
+            specs = {spec['name']: spec for spec in meta['columns']}
+            names = index_columns + list(columns)
+            df = pd.DataFrame({name: self._decode(specs[name], rows) for name in names}, columns=names)
+            df.set_index(index_columns, inplace=True)
+            df.index.names = meta['index_names']
+
+            # The row selection above is a superset, this applies the exact predicate semantics
+            return dfutils.filter(df, start_date, end_date, assets)
+
+        def _rows(self, start_date, end_date, assets):
+            meta = self.meta
+            rows = slice(0, meta['length'])
+
+            date_spec = self._index_spec('as_of_date')
+
+            if date_spec is not None and meta.get('sorted_by') == 'as_of_date':
+                dates = self._load(date_spec)
+
+                if start_date is not None:
+                    rows = slice(dates.searchsorted(self._date_bound(start_date, -1, dates.dtype)), rows.stop)
+
+                if end_date is not None:
+                    rows = slice(rows.start, dates.searchsorted(self._date_bound(end_date, 1, dates.dtype), side='right'))
+
+            asset_spec = self._index_spec(dfutils.ASSET_COLUMN)
+
+            if assets is not None and asset_spec is not None and asset_spec['kind'] == 'object':
+                wanted = np.flatnonzero(pd.Index(asset_spec['values']).isin(assets))
+                codes = pd.Index(np.asarray(self._load(asset_spec)[rows]))
+                rows = rows.start + np.flatnonzero(codes.isin(wanted))
+
+            return rows
+
+        def _index_spec(self, name):
+            try:
+                return self.meta['columns'][self.meta['index_names'].index(name)]
+            except ValueError:
+                return None
+
+        @staticmethod
+        def _date_bound(date, days, dtype):
+            date = pd.Timestamp(date)
+
+            if date.tzinfo is not None:
+                date = date.tz_convert('UTC').tz_localize(None)
+
+            # Widened by a day so timezone handling is left to dfutils.filter
+            date = date.normalize() + pd.Timedelta(days=days)
+
+            return np.datetime64(date.value, 'ns').astype(dtype)
+
+        def store(self, df):
+            names, values = self._columns(df)
+            sorted_by = None
+
+            if 'as_of_date' in df.index.names:
+                try:
+                    dates = pd.to_datetime(df.index.get_level_values('as_of_date'))
+                    order = np.argsort(dates.asi8, kind='mergesort')
+                    values = [v.take(order) if isinstance(v, pd.Index) else v.iloc[order] for v in values]
+                    sorted_by = 'as_of_date'
+                except (TypeError, ValueError):
+                    pass
+
+            staging_path = '{}.tmp'.format(self.path)
+            shutil.rmtree(staging_path, ignore_errors=True)
+            os.makedirs(staging_path)
+
+            meta = {
+                'index_names': list(df.index.names),
+                'length': len(df),
+                'sorted_by': sorted_by,
+                'columns': [self._encode(staging_path, i, name, pd.Series(v)) for i, (name, v) in enumerate(zip(names, values))]
+            }
+
+            self._publish(staging_path, meta)
+
+        def store_chunks(self, dfs):
+            """Stores the concatenation of the frames ``dfs`` yields, holding only one of them in memory.
+
+            Every frame is encoded into part files of its own, which are then merged column by column into
+            memory-mapped files. Frames yielded in ``as_of_date`` order are stored sorted by it, like ``store``
+            does, otherwise they are stored in the order they come in.
+            """
+            staging_path = '{}.tmp'.format(self.path)
+            shutil.rmtree(staging_path, ignore_errors=True)
+            os.makedirs(staging_path)
+
+            empty = index_names = None
+            parts = []
+            length = 0
+            sorted_by, last_date = 'as_of_date', None
+
+            for df in dfs:
+                # Empty frames would encode their columns as objects, they are only stored when all of them are
+                if len(df) == 0:
+                    empty = df if empty is None else empty
+                    continue
+
+                if 'as_of_date' not in df.index.names:
+                    sorted_by = None
+
+                if sorted_by is not None:
+                    try:
+                        dates = pd.to_datetime(df.index.get_level_values('as_of_date')).asi8
+                    except (TypeError, ValueError):
+                        dates = None
+
+                    if dates is None or (np.diff(dates) < 0).any() or (last_date is not None and dates[0] < last_date):
+                        sorted_by = None
+                    else:
+                        last_date = dates[-1]
+
+                index_names = list(df.index.names)
+                parts.append([
+                    self._encode(staging_path, i, name, pd.Series(v), '{}.{}.npy'.format(i, len(parts)))
+                    for i, (name, v) in enumerate(zip(*self._columns(df)))
+                ])
+                length += len(df)
+
+            if not parts:
+                shutil.rmtree(staging_path, ignore_errors=True)
+
+                if empty is None:
+                    raise ValueError('No frames to store under {}'.format(self.key))
+
+                return self.store(empty)
+
+            meta = {
+                'index_names': index_names,
+                'length': length,
+                'sorted_by': sorted_by,
+                'columns': [self._merge(staging_path, i, [part[i] for part in parts], length) for i in range(len(parts[0]))]
+            }
+
+            self._publish(staging_path, meta)
+
+        def _publish(self, staging_path, meta):
+            with open(os.path.join(staging_path, self.META_FILENAME), 'wb') as f:
+                pickle.dump(meta, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+            shutil.rmtree(self.path, ignore_errors=True)
+            os.rename(staging_path, self.path)
+
+        def _columns(self, df):
+            names = [self.INDEX_COLUMN.format(i) for i in range(df.index.nlevels)] + list(df.columns)
+            values = [df.index.get_level_values(i) for i in range(df.index.nlevels)]
+            values += [df.iloc[:, i] for i in range(len(df.columns))]
+
+            return names, values
+
+        def _merge(self, path, i, specs, length):
+            """Concatenates the part files of column ``i`` into one, re-encoding them when their encodings differ"""
+            spec = dict(specs[0], file='{}.npy'.format(i))
+            arrays = [np.load(os.path.join(path, part['file']), mmap_mode='r') for part in specs]
+
+            if all(self._same_encoding(part, spec) for part in specs):
+                dtype = np.result_type(*arrays)
+            else:
+                spec = {'name': spec['name'], 'file': spec['file'], 'kind': 'object'}
+                dtype = np.int64
+
+            merged = np.lib.format.open_memmap(os.path.join(path, spec['file']), mode='w+', dtype=dtype, shape=(length,))
+            uniques = pd.Index([], dtype=object)
+            start = 0
+
+            for part, array in zip(specs, arrays):
+                if spec['kind'] == 'object':
+                    values = np.asarray(self._decode_array(part, np.asarray(array)), dtype=object)
+                    codes, part_uniques = pd.factorize(values)
+                    positions = uniques.get_indexer(part_uniques)
+                    new = positions < 0
+                    positions[new] = len(uniques) + np.arange(new.sum())
+                    uniques = uniques.append(pd.Index(part_uniques[new], dtype=object))
+                    array = np.where(codes >= 0, positions[codes], -1) if len(positions) > 0 else codes
+
+                merged[start:start + len(array)] = array
+                start += len(array)
+
+            del merged, arrays
+
+            for part in specs:
+                os.remove(os.path.join(path, part['file']))
+
+            if spec['kind'] == 'object':
+                spec['values'] = np.asarray(uniques, dtype=object)
+
+            return spec
+
+        @staticmethod
+        def _same_encoding(part, spec):
+            if part['kind'] != spec['kind'] or part['kind'] == 'object':
+                return False
+            elif part['kind'] == 'datetime':
+                return part['tz'] == spec['tz']
+            elif part['kind'] == 'category':
+                return part['ordered'] == spec['ordered'] and list(part['categories']) == list(spec['categories'])
+
+            return True
+
+        @staticmethod
+        def _encode(path, i, name, values, filename=None):
+            spec = {'name': name, 'file': filename or '{}.npy'.format(i)}
+
+            if str(values.dtype) == 'category':
+                spec['kind'] = 'category'
+                spec['categories'] = np.asarray(values.cat.categories, dtype=object)
+                spec['ordered'] = values.cat.ordered
+                array = values.cat.codes.values
+            elif values.dtype.kind == 'M':
+                spec['kind'] = 'datetime'
+                spec['tz'] = getattr(values.dt, 'tz', None)
+                array = values.values
+            elif values.dtype.kind in 'biufcm':
+                spec['kind'] = 'array'
+                array = values.values
+            elif len(values) > 0 and all(type(v) is datetime.date for v in values.values):
+                spec['kind'] = 'date'
+                array = values.values.astype('datetime64[D]')
+            else:
+                codes, uniques = pd.factorize(values.values)
+                spec['kind'] = 'object'
+                spec['values'] = np.asarray(uniques, dtype=object)
+                array = codes
+
+            np.save(os.path.join(path, spec['file']), array)
+
+            return spec
+
+        def _load(self, spec):
+            path = os.path.join(self.path, spec['file'])
+
+            return np.load(path, mmap_mode='r' if self.meta['length'] > 0 else None)
+
+        def _decode(self, spec, rows=slice(None)):
+            return self._decode_array(spec, np.asarray(self._load(spec)[rows]))
+
+        @staticmethod
+        def _decode_array(spec, array):
+            if spec['kind'] == 'category':
+                return pd.Categorical.from_codes(array, spec['categories'], ordered=spec['ordered'])
+            elif spec['kind'] == 'datetime':
+                values = pd.DatetimeIndex(array)
+                return values if spec['tz'] is None else values.tz_localize('UTC').tz_convert(spec['tz'])
+            elif spec['kind'] == 'date':
+                return array.astype(object)
+            elif spec['kind'] == 'object':
+                values = np.empty(len(array), dtype=object)
+                found = array >= 0
+                values[found] = spec['values'][array[found]]
+                values[~found] = np.nan
+                return values
+            else:
+                return array
 
 
 class RemoteCache(Cache):
+    """Read-only tier holding the prebuilt HDF5 datasets of the current quarter in ``cfg.S3_DATA_BUCKET``.
+
+    Objects larger than ``part_size`` are downloaded as ranged GETs of ``part_size`` bytes, ``max_concurrency``
+    at a time. ``endpoint_url`` (default ``cfg.S3_ENDPOINT_URL``) points the cache at any S3 compatible server.
+    """
+
+    def __init__(self, endpoint_url=None, part_size=8 * 1024 ** 2, max_concurrency=10):
+        self.endpoint_url = endpoint_url if endpoint_url is not None else cfg.S3_ENDPOINT_URL
+        self.part_size = part_size
+        self.max_concurrency = max_concurrency
 
     @memoized_property
     def s3_bucket(self):
-        return boto3.resource('s3', region_name='us-east-1', config=Config(signature_version=UNSIGNED)).Bucket(cfg.S3_DATA_BUCKET)
+        # Path style addressing, the dots in the bucket name break TLS for virtual hosted buckets
+        config = Config(
+            signature_version=UNSIGNED,
+            s3={'addressing_style': 'path'},
+            connect_timeout=10,
+            retries={'max_attempts': 2}
+        )
+        s3 = boto3.resource('s3', region_name='us-east-1', endpoint_url=self.endpoint_url, config=config)
+
+        return s3.Bucket(cfg.S3_DATA_BUCKET)
+
+    @memoized_property
+    def transfer_config(self):
+        return TransferConfig(
+            multipart_threshold=self.part_size,
+            multipart_chunksize=self.part_size,
+            max_concurrency=self.max_concurrency
+        )
+
+    def download(self, key, path):
+        self.CacheItem(self, key).download(path)
+
+    def url(self, filename):
+        """Public URL of ``filename`` in the folder of the current quarter"""
+        endpoint_url = self.endpoint_url or 'https://s3.amazonaws.com'
+
+        return '{}/{}/research/{}/{}'.format(endpoint_url.rstrip('/'), cfg.S3_DATA_BUCKET, cfg.CURRENT_QUARTER, filename)
 
     class CacheItem(Cache.CacheItem):
 
@@ -120,10 +796,11 @@ class RemoteCache(Cache):
         @property
         def exists(self):
             try:
-                self.df
+                self.s3_object.load()
                 return True
             except botocore.exceptions.ClientError as ex:
-                if ex.response['Error']['Code'] == '404':
+                # Anonymous requests for missing keys are denied rather than not found
+                if ex.response['Error']['Code'] in ('403', '404'):
                     return False
                 else:
                     raise
@@ -131,8 +808,12 @@ class RemoteCache(Cache):
         @memoized_property
         def df(self):
             with tempfile.NamedTemporaryFile(suffix=self.filename) as f:
-                self.s3_object.download_file(f.name)
-                return pd.read_hdf(f.name)
+                self.download(f.name)
+                with HDF5_LOCK:
+                    return pd.read_hdf(f.name)
+
+        def download(self, path):
+            self.s3_object.download_file(path, Config=self.cache.transfer_config)
 
         @property
         def s3_object(self):
@@ -144,7 +825,26 @@ class RemoteCache(Cache):
 
         @memoized_property
         def filename(self):
-            return '{}.h5'.format(self.key)
+            # Published datasets are built from the published files of the quarter and aren't versioned
+            return '{}.h5'.format(self.key.split(KEY_SEPARATOR)[0])
 
         def store(self, df):
             raise NotImplementedError()
+
+
+def _source_code(func):
+    func = getattr(func, '__func__', func)
+
+    try:
+        return inspect.getsource(func)
+    except (OSError, TypeError):
+        return '{}.{}'.format(func.__module__, func.__qualname__)
+
+
+def _file_version(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
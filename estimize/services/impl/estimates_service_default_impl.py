@@ -3,6 +3,7 @@ import pandas as pd
 from injector import inject
 
 import estimize.config as cfg
+from estimize.pandas import csvutils
 from estimize.services import EstimatesService, CsvDataService, CacheService, CalendarService
 
 
@@ -14,15 +15,28 @@ class EstimatesServiceDefaultImpl(EstimatesService):
         self.csv_data_service = csv_data_service
         self.calendar_service = calendar_service
 
+    @property
+    def cache_key(self):
+        return self.cache_service.versioned_key('estimates', self.filename, self.get_estimates, self._pre_func)
+
+    @property
+    def filename(self):
+        return os.path.join(cfg.data_dir(), 'estimates.csv')
+
     def get_estimates(self) -> pd.DataFrame:
-        cache_key = 'estimates'
+        cache_key = self.cache_key
         df = self.cache_service.get(cache_key)
 
         if df is None:
-            df = pd.read_csv(os.path.join(cfg.data_dir(), 'estimates.csv'))
-            df['created_at'] = pd.to_datetime(df['created_at'])
+            df = csvutils.read_csv(self.filename, processes=cfg.CSV_PARSE_PROCESSES, pre_func=self._pre_func)
             df.set_index(['created_at', 'release_id'], inplace=True)
 
             self.cache_service.put(cache_key, df)
 
         return df
+
+    @staticmethod
+    def _pre_func(df):
+        df['created_at'] = pd.to_datetime(df['created_at'])
+
+        return df
@@ -13,24 +13,73 @@ logger = logging.getLogger(__name__)
 
 class EstimizeConsensusServiceDefaultImpl(EstimizeConsensusService):
 
+    # Only the columns the consensuses are built from are parsed, cusip is never used
+    CSV_COLUMNS = [
+        'date',
+        'ticker',
+        'fiscal_year',
+        'fiscal_quarter',
+        'reports_at',
+        'estimize.eps.weighted',
+        'estimize.eps.mean',
+        'estimize.eps.high',
+        'estimize.eps.low',
+        'estimize.eps.sd',
+        'estimize.eps.count',
+        'estimize.revenue.weighted',
+        'estimize.revenue.mean',
+        'estimize.revenue.high',
+        'estimize.revenue.low',
+        'estimize.revenue.sd',
+        'estimize.revenue.count',
+        'wallstreet.eps',
+        'wallstreet.revenue',
+        'actual.eps',
+        'actual.revenue'
+    ]
+    # Dispersions are only ever reported, single precision is plenty
+    CSV_DTYPES = {
+        'estimize.eps.sd': 'float32',
+        'estimize.revenue.sd': 'float32'
+    }
+
     @inject
     def __init__(self, csv_data_service: CsvDataService, cache_service: CacheService, asset_service: AssetService):
         self.csv_data_service = csv_data_service
         self.cache_service = cache_service
         self.asset_service = asset_service
 
+    @property
+    def final_consensuses_cache_key(self):
+        # Derived from the consensuses, rebuilt from their cached version whenever they change
+        return self.cache_service.versioned_key(
+            'estimize_final_consensuses',
+            self.consensuses_cache_key,
+            self.get_final_consensuses
+        )
+
+    @property
+    def consensuses_cache_key(self):
+        return self.cache_service.versioned_key(
+            'estimize_consensuses',
+            self.consensus_filename,
+            self.CSV_COLUMNS,
+            self.CSV_DTYPES,
+            self._pre_func,
+            self._post_func
+        )
+
     def get_final_consensuses(self, start_date=None, end_date=None, assets=None) -> pd.DataFrame:
         logger.info('get_final_consensuses: start')
 
-        cache_key = 'estimize_final_consensuses'
-        df = self.cache_service.get(cache_key)
+        cache_key = self.final_consensuses_cache_key
+        df = self.cache_service.get(cache_key, start_date, end_date, assets)
 
         if df is None:
             df = self.get_consensuses()
             df = df.iloc[df.index.get_level_values('as_of_date') == pd.to_datetime(df['reports_at_date'])]
             self.cache_service.put(cache_key, df)
-
-        df = dfutils.filter(df, start_date, end_date, assets)
+            df = dfutils.filter(df, start_date, end_date, assets)
 
         logger.info('get_final_consensuses: end')
 
@@ -39,30 +88,34 @@ class EstimizeConsensusServiceDefaultImpl(EstimizeConsensusService):
     def get_consensuses(self, start_date=None, end_date=None, assets=None) -> pd.DataFrame:
         logger.info('get_consensuses: start')
 
-        cache_key = 'estimize_consensuses'
-        df = self.cache_service.get(cache_key)
+        cache_key = self.consensuses_cache_key
+        df = self.cache_service.get(cache_key, start_date, end_date, assets)
 
         if df is None:
             df = self.csv_data_service.get_from_file(
-                filename=os.path.join(cfg.data_dir(), 'consensus.csv'),
+                filename=self.consensus_filename,
                 pre_func=self._pre_func,
                 post_func=self._post_func,
                 date_column='date',
                 date_format='%y-%m-%d',
                 timezone='US/Eastern',
-                symbol_column='ticker'
+                symbol_column='ticker',
+                usecols=self.CSV_COLUMNS,
+                dtype=self.CSV_DTYPES
             )
             self.cache_service.put(cache_key, df)
-
-        df = dfutils.filter(df, start_date, end_date, assets)
+            df = dfutils.filter(df, start_date, end_date, assets)
 
         logger.info('get_consensuses: end')
 
         return df
 
+    @property
+    def consensus_filename(self):
+        return os.path.join(cfg.data_dir(), 'consensus.csv')
+
     @staticmethod
     def _pre_func(df):
-        df.drop(['cusip'], axis=1, inplace=True)
         df[['estimize.eps.count', 'estimize.revenue.count']] = df[['estimize.eps.count', 'estimize.revenue.count']].fillna(value=0).astype('int')
 
         return df
@@ -73,10 +126,10 @@ class EstimizeConsensusServiceDefaultImpl(EstimizeConsensusService):
         df.index.name = 'as_of_date'
         df.rename(columns={'sid': 'asset'}, inplace=True)
         df.reset_index(inplace=True)
-        df['as_of_date'] = df['as_of_date'].dt.date
-        df['reports_at'] = pd.to_datetime(df['reports_at'], format='%Y-%m-%dT%H:%M:%S').dt.tz_localize('UTC').dt.tz_convert('US/Eastern')
-        df['bmo'] = df['reports_at'].dt.hour < 12
-        df['reports_at'] = df['reports_at'].dt.date
+        df['as_of_date'] = dfutils.as_of_dates(df['as_of_date'])
+        reports_at = dfutils.to_datetime(df['reports_at'], format='%Y-%m-%dT%H:%M:%S').tz_localize('UTC').tz_convert('US/Eastern')
+        df['bmo'] = reports_at.hour < 12
+        df['reports_at'] = dfutils.to_date(reports_at)
         df.rename(columns={'reports_at': 'reports_at_date'}, inplace=True)
         df.set_index(['as_of_date', 'asset'], inplace=True)
         df = df[[
@@ -102,7 +155,7 @@ class EstimizeConsensusServiceDefaultImpl(EstimizeConsensusService):
             'actual.revenue'
         ]]
 
-        return df
+        return dfutils.compact_index(df)
 
 
 class EarningsYieldQuery:
@@ -17,15 +17,23 @@ class EstimizeSignalServiceDefaultImpl(EstimizeSignalService):
         self.csv_data_service = csv_data_service
         self.cache_service = cache_service
 
+    @property
+    def cache_key(self):
+        return self.cache_service.versioned_key('estimize_signals', self.filename, self._pre_func, self._post_func)
+
+    @property
+    def filename(self):
+        return os.path.join(cfg.data_dir(), 'signal_time_series.csv')
+
     def get_signals(self, start_date=None, end_date=None, assets=None) -> pd.DataFrame:
         logger.info('get_signals: start')
 
-        cache_key = 'estimize_signals'
-        df = self.cache_service.get(cache_key)
+        cache_key = self.cache_key
+        df = self.cache_service.get(cache_key, start_date, end_date, assets)
 
         if df is None:
             df = self.csv_data_service.get_from_file(
-                filename=os.path.join(cfg.data_dir(), 'signal_time_series.csv'),
+                filename=self.filename,
                 pre_func=self._pre_func,
                 post_func=self._post_func,
                 date_column='as_of',
@@ -34,8 +42,7 @@ class EstimizeSignalServiceDefaultImpl(EstimizeSignalService):
                 symbol_column='ticker'
             )
             self.cache_service.put(cache_key, df)
-
-        df = dfutils.filter(df, start_date, end_date, assets)
+            df = dfutils.filter(df, start_date, end_date, assets)
 
         logger.info('get_signals: end')
 
@@ -53,10 +60,10 @@ class EstimizeSignalServiceDefaultImpl(EstimizeSignalService):
         df.index.name = 'as_of_date'
         df.rename(columns={'sid': 'asset'}, inplace=True)
         df.reset_index(inplace=True)
-        df['reports_at'] = pd.to_datetime(df['reports_at'], format='%Y-%m-%dT%H:%M:%S').dt.tz_localize('UTC').dt.tz_convert('US/Eastern')
-        df['bmo'] = df['reports_at'].dt.hour < 12
-        df['reports_at'] = df['reports_at'].dt.date
+        reports_at = dfutils.to_datetime(df['reports_at'], format='%Y-%m-%dT%H:%M:%S').tz_localize('UTC').tz_convert('US/Eastern')
+        df['bmo'] = reports_at.hour < 12
+        df['reports_at'] = dfutils.to_date(reports_at)
         df.rename(columns={'reports_at': 'reports_at_date'}, inplace=True)
         df.set_index(['as_of_date', 'asset'], inplace=True)
 
-        return df
+        return dfutils.compact_index(df)
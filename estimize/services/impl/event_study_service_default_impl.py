@@ -1,12 +1,15 @@
 import logging
+from collections import OrderedDict
 from datetime import timedelta
 
+import numpy as np
 import pandas as pd
 from injector import inject
 from memoized_property import memoized_property
 
 from estimize.pandas import dfutils
-from estimize.services import EventStudyService, CalendarService, FactorService, AssetService
+from estimize.stats.bootstrap import bootstrap_mean_intervals
+from estimize.services import EventStudyService, CalendarService, FactorService, ResidualReturnsService
 
 logger = logging.getLogger(__name__)
 
@@ -14,52 +17,202 @@ logger = logging.getLogger(__name__)
 class EventStudyServiceDefaultImpl(EventStudyService):
 
     @inject
-    def __init__(self, calendar_service: CalendarService, factor_service: FactorService, asset_service: AssetService):
+    def __init__(self, calendar_service: CalendarService, factor_service: FactorService,
+                 residual_returns_service: ResidualReturnsService):
         self.calendar_service = calendar_service
         self.factor_service = factor_service
-        self.asset_service = asset_service
+        self.residual_returns_service = residual_returns_service
 
-    def run_event_study(self, events: pd.DataFrame, on='open', days_before=10, days_after=5) -> pd.DataFrame:
+    def run_event_study(self, events: pd.DataFrame, on='open', days_before=10, days_after=5, confidence=None,
+                        bootstrap_draws=1000, chunk_size=None) -> pd.DataFrame:
         return EventStudy(
             calendar_service=self.calendar_service,
             factor_service=self.factor_service,
-            asset_service=self.asset_service,
+            residual_returns_service=self.residual_returns_service,
             events=events,
             on=on,
             days_before=days_before,
-            days_after=days_after
+            days_after=days_after,
+            confidence=confidence,
+            bootstrap_draws=bootstrap_draws,
+            chunk_size=chunk_size
         ).results()
 
+    def run_event_studies(self, studies: dict) -> dict:
+        """Runs several event studies, loading market factors once for all of them.
+
+        Studies of the same events frame with the same ``days_before`` and ``days_after`` also share their event
+        windows, so running one set of events on both open and close returns windows them once.
+
+        ``studies`` maps a name to the keyword arguments of ``run_event_study`` (``events`` and optionally
+        ``on``, ``days_before``, ``days_after``, ``confidence``, ``bootstrap_draws`` and ``chunk_size``), the
+        results are returned under the same names in an ``OrderedDict``. Pass an ``OrderedDict`` to get them
+        in a given order.
+        """
+        event_studies = OrderedDict(
+            (name, EventStudy(
+                calendar_service=self.calendar_service,
+                factor_service=self.factor_service,
+                residual_returns_service=self.residual_returns_service,
+                **study
+            )) for name, study in studies.items()
+        )
+
+        inputs = EventStudyInputs(self.factor_service, list(event_studies.values()))
+        results = OrderedDict()
+
+        for name, event_study in event_studies.items():
+            logger.info('run_event_studies: running {}'.format(name))
+
+            event_study.inputs = inputs
+            results[name] = event_study.results()
+
+        return results
+
 
 class EventStudy(object):
+    """Mean and cumulative mean residual returns around events, per ``event_time`` and group columns.
+
+    With a ``confidence`` level the results also hold standard errors and t-stats of the daily and
+    cumulative residual returns, and percentile bootstrap intervals of the cumulative ones computed from
+    ``bootstrap_draws`` resamples of the events.
+
+    With a ``chunk_size`` events are processed that many at a time in date order and only per group sums,
+    sums of squares and counts are kept between chunks, so memory doesn't grow with the number of events.
+    Bootstrap intervals need every event at once and are left out in that mode.
+    """
+
+    BOOTSTRAP_SEED = 0
 
     def __init__(self,
                  calendar_service,
                  factor_service,
-                 asset_service,
+                 residual_returns_service,
                  events,
-                 on,
+                 on='open',
                  days_before=10,
-                 days_after=5
+                 days_after=5,
+                 inputs=None,
+                 confidence=None,
+                 bootstrap_draws=1000,
+                 chunk_size=None
                  ):
         self.calendar_service = calendar_service
         self.factor_service = factor_service
-        self.asset_service = asset_service
+        self.residual_returns_service = residual_returns_service
         self.events = events
         self.on = on
         self.days_before = days_before
         self.days_after = days_after
+        self.inputs = inputs
+        self.confidence = confidence
+        self.bootstrap_draws = bootstrap_draws
+        self.chunk_size = chunk_size
 
     def results(self):
+        if self.chunk_size is not None:
+            return self.chunked_results()
+
         logger.debug('results: start')
 
         df = self.data
-        group_1_cols = list(set(df.columns.values) - set(['residual_return']))
+        group_1_cols = list(set(df.columns.values) - set(['residual_return', 'event_id']))
         group_2_cols = list(set(group_1_cols) - set(['event_time']))
 
+        if self.confidence is not None:
+            statistics = self.statistics(df, group_1_cols, group_2_cols)
+
         df = df.groupby(group_1_cols)['residual_return'].agg(['mean', 'count'])
         df.rename(columns={df.columns[0]: 'residual_return', df.columns[1]: 'count'}, inplace=True)
+        df = self.cumulate(df, group_1_cols, group_2_cols)
+
+        if self.confidence is not None:
+            df = df.join(statistics)
+
+        logger.debug('results: end')
+
+        return df
+
+    def chunked_results(self):
+        logger.debug('chunked_results: start')
+
+        moments = None
+
+        for i, events in enumerate(self.event_chunks):
+            logger.debug('chunked_results: chunk {} of {} events'.format(i, len(events)))
+
+            df = self.chunk(events).data
+
+            if moments is None:
+                group_1_cols = list(set(df.columns.values) - set(['residual_return', 'event_id']))
+                group_2_cols = list(set(group_1_cols) - set(['event_time']))
+
+            chunk_moments = self.moments(df, group_1_cols)
+            moments = chunk_moments if moments is None else moments.add(chunk_moments, fill_value=0.0)
+
+        if moments is None:
+            logger.debug('chunked_results: no events')
+            return self.empty_results()
+
+        count = moments['count']
+        df = pd.DataFrame({
+            'residual_return': moments['residual_return'] / count,
+            'count': count.astype(np.int64)
+        }, columns=['residual_return', 'count'])
+        df = self.cumulate(df, group_1_cols, group_2_cols)
+
+        if self.confidence is not None:
+            for column in ('residual_return', 'cumulative_residual_return'):
+                variance = (moments['{}_squared'.format(column)] - moments[column] ** 2 / count) / (count - 1)
+                std_error = np.sqrt(variance.clip(lower=0.0) / count)
+                df['{}_std_error'.format(column)] = std_error
+                df['{}_t_stat'.format(column)] = moments[column] / count / std_error
 
+        logger.debug('chunked_results: end')
+
+        return df
+
+    def empty_results(self):
+        """The result columns with no rows, indexed by ``event_time`` and the group columns of the events"""
+        group_1_cols = list(self.events.columns.values) + ['event_time']
+        columns = OrderedDict([
+            ('residual_return', np.array([], dtype=np.float64)),
+            ('count', np.array([], dtype=np.int64)),
+            ('cumulative_residual_return', np.array([], dtype=np.float64))
+        ])
+
+        if self.confidence is not None:
+            for column in ('residual_return', 'cumulative_residual_return'):
+                columns['{}_std_error'.format(column)] = np.array([], dtype=np.float64)
+                columns['{}_t_stat'.format(column)] = np.array([], dtype=np.float64)
+
+        if len(group_1_cols) > 1:
+            index = pd.MultiIndex.from_arrays([[]] * len(group_1_cols), names=group_1_cols)
+        else:
+            index = pd.Index([], dtype=np.int64, name='event_time')
+
+        return pd.DataFrame(columns, index=index, columns=list(columns))
+
+    @staticmethod
+    def moments(df, group_1_cols):
+        df = df.sort_values(['event_id', 'event_time'])
+        df['cumulative_residual_return'] = df.groupby('event_id')['residual_return'].cumsum()
+        df['residual_return_squared'] = df['residual_return'] ** 2
+        df['cumulative_residual_return_squared'] = df['cumulative_residual_return'] ** 2
+
+        grouped = df.groupby(group_1_cols)
+        moments = grouped[[
+            'residual_return',
+            'residual_return_squared',
+            'cumulative_residual_return',
+            'cumulative_residual_return_squared'
+        ]].sum()
+        moments['count'] = grouped['residual_return'].count()
+
+        return moments
+
+    @staticmethod
+    def cumulate(df, group_1_cols, group_2_cols):
         if len(group_2_cols) > 0:
             df.reset_index(inplace=True)
             df.set_index('event_time', inplace=True)
@@ -70,10 +223,77 @@ class EventStudy(object):
         df.reset_index(inplace=True)
         df.set_index(group_1_cols, inplace=True)
 
-        logger.debug('results: end')
-
         return df
 
+    @property
+    def event_chunks(self):
+        dates = pd.to_datetime(self.events.index.get_level_values('as_of_date'))
+        events = self.events.iloc[np.argsort(dates.values, kind='mergesort')]
+
+        for start in range(0, len(events), self.chunk_size):
+            yield events.iloc[start:start + self.chunk_size]
+
+    def chunk(self, events):
+        return EventStudy(
+            calendar_service=self.calendar_service,
+            factor_service=self.factor_service,
+            residual_returns_service=self.residual_returns_service,
+            events=events,
+            on=self.on,
+            days_before=self.days_before,
+            days_after=self.days_after,
+            inputs=self.inputs
+        )
+
+    def statistics(self, df, group_1_cols, group_2_cols):
+        logger.debug('statistics: start')
+
+        df = df.sort_values(['event_id', 'event_time'])
+        df['cumulative_residual_return'] = df.groupby('event_id')['residual_return'].cumsum()
+
+        grouped = df.groupby(group_1_cols)
+        count = grouped['residual_return'].count()
+        sdf = pd.DataFrame(index=count.index)
+
+        for column in ('residual_return', 'cumulative_residual_return'):
+            std_error = grouped[column].std() / np.sqrt(count)
+            sdf['{}_std_error'.format(column)] = std_error
+            sdf['{}_t_stat'.format(column)] = grouped[column].mean() / std_error
+
+        # One events x event_times matrix of cumulative residual returns per group, resampled by event
+        groups = list(df.groupby(group_2_cols)) if len(group_2_cols) > 0 else [((), df)]
+        matrices = []
+
+        for _, gdf in groups:
+            matrix = gdf.set_index(['event_id', 'event_time'])['cumulative_residual_return'].unstack('event_time')
+            matrices.append(matrix.ffill(axis=1).fillna(0.0))
+
+        intervals = bootstrap_mean_intervals(
+            [matrix.values for matrix in matrices],
+            draws=self.bootstrap_draws,
+            confidence=self.confidence,
+            seed=self.BOOTSTRAP_SEED
+        )
+        bounds = []
+
+        for (key, _), matrix, (lower, upper) in zip(groups, matrices, intervals):
+            bdf = pd.DataFrame({
+                'event_time': matrix.columns.values,
+                'cumulative_residual_return_lower': lower,
+                'cumulative_residual_return_upper': upper
+            })
+
+            for column, value in zip(group_2_cols, key if isinstance(key, tuple) else (key,)):
+                bdf[column] = value
+
+            bounds.append(bdf)
+
+        sdf = sdf.join(pd.concat(bounds).set_index(group_1_cols))
+
+        logger.debug('statistics: end')
+
+        return sdf
+
     @property
     def data(self):
         logger.debug('data: start')
@@ -89,83 +309,71 @@ class EventStudy(object):
 
     @property
     def residual_returns(self):
+        """Residual return of every window row, gathered from the precomputed returns panel"""
         logger.debug('residual_returns: start')
 
-        df = self.windowed_events.join(self.asset_returns)
+        df = self.windowed_events
+        returns, benchmark_returns = self.returns_panel.gather(
+            df.index.get_level_values('as_of_date'),
+            df.index.get_level_values('asset')
+        )
+        df['residual_return'] = returns - (df['alpha'].values + df['beta'].values * benchmark_returns)
+        df.drop(['alpha', 'beta'], axis=1, inplace=True)
         df.reset_index(inplace=True)
         df.set_index(['as_of_date'], inplace=True)
 
-        df = df.join(self.benchmark_returns)
-        df['residual_return'] = df['return'] - (df['alpha'] + (df['beta'] * df['benchmark_return']))
-        df.drop(['benchmark_return', 'return', 'alpha', 'beta'], axis=1, inplace=True)
+        logger.debug('residual_returns: end')
 
         return df
 
     @property
-    def asset_returns(self):
-        logger.debug('asset_returns: start')
-
-        df = self.asset_service.get_returns(self.start_date, self.end_date, self.assets)[[self.return_column]]
-        df.rename(columns={self.return_column: 'return'}, inplace=True)
-
-        logger.debug('asset_returns: end')
-
-        return df
+    def returns_panel(self):
+        return self.residual_returns_service.get_returns_panel(self.on)
 
     @property
-    def benchmark_returns(self):
-        logger.debug('benchmark_returns: start')
-
-        spy = self.asset_service.get_asset('SPY')
-        df = self.asset_service.get_returns(self.start_date, self.end_date, [spy])[[self.return_column]]
-        df.reset_index(inplace=True)
-        df.set_index(['as_of_date'], inplace=True)
-        df.drop(['asset'], axis=1, inplace=True)
-        df.rename(columns={self.return_column: 'benchmark_return'}, inplace=True)
-
-        logger.debug('benchmark_returns: end')
+    def windowed_events(self):
+        if self.inputs is not None:
+            return self.inputs.windowed_events(self)
 
-        return df
+        return self.build_windowed_events()
 
-    @memoized_property
-    def return_column(self):
-        if self.on == 'open':
-            return 'open_return'
-        else:
-            return 'close_return'
+    def build_windowed_events(self):
+        """Expands every event into ``days_before`` sessions before and ``days_after`` sessions after it.
 
-    @property
-    def windowed_events(self):
+        Event dates are mapped to session ordinals once and the windows are gathered as whole arrays, each
+        window row carrying the columns of its event and its ``event_time`` relative to the event session.
+        """
         logger.debug('windowed_events: start')
 
         df = self.events_with_market_factors
         df['event_time'] = 0
-
-        windows = []
-
-        for row in df.iterrows():
-            index = row[0]
-            cols = row[1]
-            date = index[0]
-            asset = index[1]
-
-            prior_dates = self.calendar_service.get_n_trading_days_from(-self.days_before, date)
-            post_dates = self.calendar_service.get_n_trading_days_from(self.days_after, date)
-            dates = prior_dates + post_dates
-
-            event_times = list(range(-self.days_before, 0)) + list(range(1, self.days_after + 1))
-            indexes = [(d, asset) for d in dates]
-            rdf = pd.DataFrame({'event_time': event_times}, index=indexes)
-
-            for col in cols.index.values:
-                if col != 'event_time':
-                    rdf[col] = cols[col]
-
-            windows.append(rdf)
+        df['event_id'] = np.arange(len(df))
+
+        event_dates = df.index.get_level_values('as_of_date')
+
+        # Sessions strictly before and strictly after each event date, whether or not it is a session itself
+        before = self.calendar_service.get_session_ordinals(event_dates, side='left')
+        after = self.calendar_service.get_session_ordinals(event_dates, side='right')
+        positions = np.concatenate([
+            before[:, np.newaxis] + np.arange(-self.days_before, 0),
+            after[:, np.newaxis] + np.arange(0, self.days_after)
+        ], axis=1).ravel()
+        event_times = np.concatenate([np.arange(-self.days_before, 0), np.arange(1, self.days_after + 1)])
+
+        rows = np.repeat(np.arange(len(df)), len(event_times))
+        valid = (positions >= 0) & (positions < len(self.session_dates))
+        rows, positions = rows[valid], positions[valid]
+
+        windows = df.iloc[rows].copy()
+        windows['event_time'] = np.tile(event_times, len(df))[valid]
+        windows.index = pd.MultiIndex.from_arrays(
+            [self.session_dates[positions], df.index.get_level_values('asset').take(rows)],
+            names=df.index.names
+        )
 
         logger.debug('windowed_events: concat start')
 
-        df = pd.concat([df] + windows, copy=False)
+        df = pd.concat([df, windows], copy=False)
 
         logger.debug('windowed_events: concat end')
 
@@ -175,6 +383,10 @@ class EventStudy(object):
 
         return df
 
+    @memoized_property
+    def session_dates(self):
+        return np.asarray(dfutils.as_of_dates(self.calendar_service.get_sessions()))
+
     @property
     def events_with_market_factors(self):
         logger.debug('events_with_market_factors: start')
@@ -193,11 +405,13 @@ class EventStudy(object):
     def events_with_estimation_as_of_dates(self):
         logger.debug('events_with_estimation_as_of_dates: start')
 
-        def shift_date(date):
-            return self.calendar_service.get_n_trading_days_from(-(self.days_before + 2), date)[0]
+        dates = self.calendar_service.shift_sessions(
+            self.events.index.get_level_values('as_of_date'),
+            -(self.days_before + 2)
+        )
 
         df = self.events.copy()
-        df['estimation_as_of_date'] = df.index.get_level_values('as_of_date').map(shift_date)
+        df['estimation_as_of_date'] = dfutils.as_of_dates(dates)
         df.reset_index(inplace=True)
         df.rename(columns={'as_of_date': 'original_as_of_date'}, inplace=True)
         df.rename(columns={'estimation_as_of_date': 'as_of_date'}, inplace=True)
@@ -211,7 +425,10 @@ class EventStudy(object):
     def market_factors(self):
         logger.debug('market_factors: start')
 
-        df = self.factor_service.get_market_factors(self.start_date, self.end_date, self.assets)
+        if self.inputs is not None:
+            df = self.inputs.market_factors
+        else:
+            df = self.factor_service.get_market_factors(self.start_date, self.end_date, self.assets)
 
         logger.debug('market_factors: end')
 
@@ -234,3 +451,61 @@ class EventStudy(object):
     @memoized_property
     def end_date(self):
         return self.events.index.get_level_values('as_of_date').max() + timedelta(days=self.days_after * 2)
+
+
+class EventStudyInputs(object):
+    """Market factors covering the dates and assets of several event studies, and the event windows studies of
+    the same events and window lengths have in common"""
+
+    def __init__(self, factor_service, event_studies):
+        self.factor_service = factor_service
+        self.event_studies = event_studies
+        self.windows = {}
+
+        # Chunked studies window their chunks one at a time, holding all of their windows would defeat the purpose
+        keys = [self.window_key(event_study) for event_study in event_studies if event_study.chunk_size is None]
+        self.window_users = {key: keys.count(key) for key in keys if keys.count(key) > 1}
+
+    @staticmethod
+    def window_key(event_study):
+        return id(event_study.events), event_study.days_before, event_study.days_after
+
+    def windowed_events(self, event_study):
+        """The windows of ``event_study``, built once for every study that shares them and dropped after the last"""
+        key = self.window_key(event_study)
+
+        if key not in self.window_users:
+            return event_study.build_windowed_events()
+
+        if key not in self.windows:
+            self.windows[key] = event_study.build_windowed_events()
+
+        self.window_users[key] -= 1
+
+        if self.window_users[key] == 0:
+            del self.window_users[key]
+            return self.windows.pop(key)
+
+        # Studies add and drop columns of their windows in place
+        return self.windows[key].copy()
+
+    @memoized_property
+    def market_factors(self):
+        return self.factor_service.get_market_factors(self.start_date, self.end_date, self.assets)
+
+    @memoized_property
+    def assets(self):
+        assets = OrderedDict()
+
+        for event_study in self.event_studies:
+            assets.update((asset, None) for asset in event_study.assets)
+
+        return list(assets)
+
+    @memoized_property
+    def start_date(self):
+        return min(event_study.start_date for event_study in self.event_studies)
+
+    @memoized_property
+    def end_date(self):
+        return max(event_study.end_date for event_study in self.event_studies)
@@ -1,17 +1,18 @@
 import logging
 import os
+import tempfile
 from injector import inject
 
 import estimize.config as cfg
 from estimize.pandas import dfutils
 from estimize.services import FactorService, CacheService, AssetService, CalendarService, EstimizeConsensusService, \
     CsvDataService
+from estimize.stats.regression import rolling_market_model, rolling_market_model_panel
 from memoized_property import memoized_property
 import multiprocessing as mp
 import pathos.pools as pp
 import numpy as np
 import pandas as pd
-import statsmodels.api as sm
 
 logger = logging.getLogger(__name__)
 counter = mp.Value('i', 0)
@@ -28,15 +29,23 @@ class FactorServiceDefaultImpl(FactorService):
         self.csv_data_service = csv_data_service
         self.asset_service = asset_service
 
+    @property
+    def cache_key(self):
+        return self.cache_service.versioned_key('market_factors', self.url, self._post_func)
+
+    @property
+    def url(self):
+        return '{}/market_factors.csv'.format(cfg.ROOT_DATA_URL)
+
     def get_market_factors(self, start_date=None, end_date=None, assets=None, use_cache=True) -> pd.DataFrame:
         logger.info('get_market_factors: start')
 
-        cache_key = 'market_factors'
-        df = self.cache_service.get(cache_key)
+        cache_key = self.cache_key
+        df = self.cache_service.get(cache_key, start_date, end_date, assets)
 
         if df is None:
             df = self.csv_data_service.get_from_url(
-                url='{}/market_factors.csv'.format(cfg.ROOT_DATA_URL),
+                url=self.url,
                 post_func=self._post_func,
                 date_column='as_of_date',
                 timezone='US/Eastern',
@@ -44,39 +53,81 @@ class FactorServiceDefaultImpl(FactorService):
             )
 
             self.cache_service.put(cache_key, df)
-
-        df = dfutils.filter(df, start_date, end_date, assets)
+            df = dfutils.filter(df, start_date, end_date, assets)
 
         logger.info('get_market_factors: end')
 
         return df
 
-    def build_market_factors(self):
-        try:
-            fdf = self.get_market_factors()
-            start_date = fdf.index.get_level_values('as_of_date').max()
-        except:
-            logger.exception('Error while loading market_factors.csv')
-            fdf = None
+    def build_market_factors(self, panel=False):
+        """Fits market factors for the sessions missing from ``data/market_factors.csv`` and appends them.
+
+        Only the sessions after the last persisted ``as_of_date`` are fitted (plus the trailing window of
+        returns they need), so a daily run scales with the number of new sessions. Without a local file the
+        published factors are used as the starting point and the whole file is written once.
+        """
+        path = os.path.join(cfg.data_dir(), 'market_factors.csv')
+        fdf = None
+
+        if os.path.exists(path):
+            last_date = self._last_market_factor_date(path)
+        else:
+            try:
+                fdf = self.get_market_factors()
+                last_date = pd.Timestamp(fdf.index.get_level_values('as_of_date').max())
+            except:
+                logger.exception('Error while loading market_factors.csv')
+                last_date = None
+
+        if last_date is None:
             start_date = cfg.DEFAULT_START_DATE
+        else:
+            # There is no next session when the file already ends on the last one of the calendar
+            next_sessions = self.calendar_service.get_n_trading_days_from(1, last_date)
+            end_date = self.calendar_service.get_valid_trading_end_date(cfg.DEFAULT_END_DATE)
+
+            if len(next_sessions) == 0 or next_sessions[0] > end_date:
+                logger.info('build_market_factors: up to date as of {}'.format(last_date))
+                return
+
+            start_date = next_sessions[0]
 
         assets = dfutils.unique_assets(self.estimize_consensus_service.get_final_consensuses())
         df = MarketFactorModelQuery(
             asset_service=self.asset_service,
             calendar_service=self.calendar_service,
             assets=assets,
-            start_date=start_date
+            start_date=start_date,
+            panel=panel
         ).results()
 
-        if fdf is not None:
-            df = fdf.combine_first(df)
+        # Save the generated rows as a csv, appending to the existing file when there is one
+        csv_df = self._csv_frame(df)
+
+        if os.path.exists(path):
+            csv_df.to_csv(path, mode='a', header=False)
+        else:
+            if fdf is not None:
+                csv_df = pd.concat([self._csv_frame(fdf), csv_df])
+
+            csv_df.to_csv(path)
+
+    @staticmethod
+    def _last_market_factor_date(path):
+        dates = pd.read_csv(path, usecols=['as_of_date'])['as_of_date']
+
+        return pd.Timestamp(dates.max()) if len(dates) > 0 else None
 
-        # Save the generated file as a csv
-        csv_df = df.reset_index()
-        csv_df['ticker'] = csv_df['asset'].map(lambda a: a.symbol)
+    def _csv_frame(self, df):
+        csv_df = dfutils.to_datetime_level(df).reset_index()
+        codes, assets = pd.factorize(csv_df['asset'].values)
+        symbols = [asset.symbol for asset in self.asset_service.retrieve_assets(assets)]
+        csv_df['ticker'] = np.array(symbols, dtype=object)[codes]
         csv_df.drop(['asset'], axis=1, inplace=True)
         csv_df.set_index(['as_of_date', 'ticker'], inplace=True)
-        csv_df.to_csv(os.path.join(cfg.data_dir(), 'market_factors.csv'))
+        csv_df.sort_index(inplace=True)
+
+        return csv_df[['alpha', 'beta']]
 
     @staticmethod
     def _post_func(df):
@@ -84,29 +135,35 @@ class FactorServiceDefaultImpl(FactorService):
         df.index.name = 'as_of_date'
         df.rename(columns={'sid': 'asset'}, inplace=True)
         df.reset_index(inplace=True)
-        df['as_of_date'] = df['as_of_date'].dt.date
+        df['as_of_date'] = dfutils.as_of_dates(df['as_of_date'])
         df.set_index(['as_of_date', 'asset'], inplace=True)
 
-        return df
+        return dfutils.compact_index(df)
 
 
 class MarketFactorModelQuery:
 
     ASYNC_DEBUG = False
     DEBUG = False
+    SIGNIFICANCE_LEVEL = 0.05
+    BATCHES_PER_PROCESS = 4
 
     def __init__(self,
                  asset_service: AssetService,
                  calendar_service: CalendarService,
                  assets,
                  start_date=cfg.DEFAULT_START_DATE,
-                 window_length=126
+                 window_length=126,
+                 panel=False,
+                 min_observations=None
                  ):
         self.asset_service = asset_service
         self.calendar_service = calendar_service
         self.assets = assets
         self._start_date = start_date
         self.window_length = window_length
+        self.panel = panel
+        self.min_observations = min_observations
         self.pool = pp.ProcessPool(mp.cpu_count())
 
     def results(self):
@@ -114,11 +171,16 @@ class MarketFactorModelQuery:
 
         counter = mp.Value('i', 0)
 
-        if not self.ASYNC_DEBUG:
+        if self.panel:
+            df = self.results_panel()
+        elif not self.ASYNC_DEBUG:
             df = self.results_async()
         else:
             df = self.results_debug()
 
+        # The leading rows only exist to fill the first window
+        df = df.iloc[pd.to_datetime(df.index.get_level_values('as_of_date')) >= self.start_date]
+
         logger.info('results: end')
 
         return df
@@ -126,24 +188,69 @@ class MarketFactorModelQuery:
     def results_async(self):
         logger.info('results_async: start')
 
-        self.benchmark_returns
-        self.asset_returns
+        returns = self.returns_matrix
+        market_returns = self.benchmark_returns['market_return'].reindex(returns.index)
 
         if self.DEBUG:
             assets = self.assets[0:5]
         else:
             assets = self.assets
 
-        dfs = self.pool.map(self.calculate_factors, self.calculations(assets))
-        self.pool.close()
-        self.pool.join()
+        columns = returns.columns.get_indexer(assets)
+        columns = columns[columns >= 0]
+        batches = np.array_split(columns, min(len(columns), mp.cpu_count() * self.BATCHES_PER_PROCESS) or 1)
 
-        df = pd.concat(dfs, copy=False)
+        matrix = SharedReturnsMatrix(returns.values, market_returns.values)
+
+        try:
+            calculations = [self.BatchFactorCalculation(matrix, batch, self.window_length) for batch in batches]
+            results = []
+
+            for result in self.pool.imap(self.calculate_factors, calculations):
+                results.append(result)
+                logger.info('progress: {}%'.format((float(len(results)) / len(calculations)) * 100))
+
+            self.pool.close()
+            self.pool.join()
+        finally:
+            matrix.close()
+
+        result_columns, rows, alpha, beta = (np.concatenate(values) for values in zip(*results))
+        index = pd.MultiIndex.from_arrays(
+            [returns.index.values[rows], returns.columns.values[result_columns]],
+            names=['as_of_date', 'asset']
+        )
+        df = pd.DataFrame({'alpha': alpha, 'beta': beta}, index=index, columns=['alpha', 'beta'])
 
         logger.info('results_async: end')
 
         return df
 
+    def results_panel(self):
+        logger.info('results_panel: start')
+
+        returns = self.returns_matrix
+        market_returns = self.benchmark_returns['market_return'].reindex(returns.index)
+        values = returns.values
+
+        model = rolling_market_model_panel(values, market_returns.values, self.window_length, self.min_observations)
+        estimated = ~np.isnan(values) & (model.observations >= (self.min_observations or self.window_length))
+        significant = model.p_value <= self.SIGNIFICANCE_LEVEL
+
+        alpha = np.where(estimated, np.where(significant, model.alpha, 0.0), np.nan)
+        beta = np.where(estimated, np.where(significant, model.beta, 0.0), np.nan)
+
+        df = pd.concat([
+            pd.DataFrame(alpha, index=returns.index, columns=returns.columns).stack(),
+            pd.DataFrame(beta, index=returns.index, columns=returns.columns).stack()
+        ], axis=1, keys=['alpha', 'beta'])
+        df.dropna(inplace=True)
+        df.index.names = ['as_of_date', 'asset']
+
+        logger.info('results_panel: end')
+
+        return df
+
     def results_debug(self):
         logger.info('results_debug: start')
 
@@ -164,10 +271,21 @@ class MarketFactorModelQuery:
 
         return df
 
+    @memoized_property
+    def returns(self):
+        """Close returns of the assets and the benchmark, one call runs the pipelines of both bundles concurrently"""
+        assets = self.asset_service.retrieve_assets(self.assets)
+        assets = [asset for asset in assets if asset.symbol != self.benchmark.symbol] + [self.benchmark]
+
+        return self.asset_service.get_returns(self.windowed_start_date, self.end_date, assets)[['close_return']]
+
+    @memoized_property
+    def benchmark(self):
+        return self.asset_service.get_asset('SPY')
+
     @memoized_property
     def benchmark_returns(self):
-        spy = self.asset_service.get_asset('SPY')
-        mrdf = self.asset_service.get_returns(self.windowed_start_date, self.end_date, [spy])[['close_return']]
+        mrdf = self.returns.iloc[self.returns.index.get_level_values('asset') == dfutils.asset_key(self.benchmark)].copy()
         mrdf.reset_index(inplace=True)
         mrdf.set_index('as_of_date', inplace=True)
         mrdf.drop(['asset'], axis=1, inplace=True)
@@ -177,11 +295,20 @@ class MarketFactorModelQuery:
 
     @memoized_property
     def asset_returns(self):
-        ardf = self.asset_service.get_returns(self.windowed_start_date, self.end_date, self.assets)[['close_return']]
+        ardf = self.returns.iloc[self.returns.index.get_level_values('asset') != dfutils.asset_key(self.benchmark)].copy()
         ardf.rename(columns={'close_return': 'return'}, inplace=True)
 
         return ardf
 
+    @memoized_property
+    def returns_matrix(self):
+        """Asset returns pivoted once into a dense ``as_of_date x asset`` float64 matrix on the benchmark dates."""
+        df = self.asset_returns['return'].unstack('asset')
+        df = df.reindex(df.index.intersection(self.benchmark_returns.index))
+        df.sort_index(inplace=True)
+
+        return df.astype(np.float64)
+
     @memoized_property
     def windowed_start_date(self):
         return self.calendar_service.get_n_trading_days_from((-self.window_length - 1), self.start_date)[0]
@@ -213,6 +340,48 @@ class MarketFactorModelQuery:
     def calculation(self, asset):
         return self.AssetFactorCalculation(self.asset_returns, self.benchmark_returns, asset, self.window_length, len(self.assets))
 
+    class BatchFactorCalculation:
+        """Fits a batch of return matrix columns inside a pool worker.
+
+        Only the shared matrix handle and the column indices are pickled; each column is fitted over its own
+        non-missing observations, exactly like ``AssetFactorCalculation``.
+        """
+
+        def __init__(self, matrix, columns, window_length):
+            self.matrix = matrix
+            self.columns = columns
+            self.window_length = window_length
+
+        def results(self):
+            values = self.matrix.open()
+            market_returns = values[:, 0]
+            result_columns, rows, alphas, betas = [], [], [], []
+
+            for column in self.columns:
+                returns = values[:, column + 1]
+                valid = np.flatnonzero(~np.isnan(returns) & ~np.isnan(market_returns))
+
+                if len(valid) < self.window_length:
+                    continue
+
+                model = rolling_market_model(returns[valid], market_returns[valid], self.window_length)
+                significant = model.p_value <= MarketFactorModelQuery.SIGNIFICANCE_LEVEL
+                window_rows = slice(self.window_length - 1, None)
+
+                result_columns.append(np.full(len(valid) - self.window_length + 1, column, dtype=np.int64))
+                rows.append(valid[window_rows])
+                alphas.append(np.where(significant, model.alpha, 0.0)[window_rows])
+                betas.append(np.where(significant, model.beta, 0.0)[window_rows])
+
+            empty = np.empty(0)
+
+            return (
+                np.concatenate(result_columns) if result_columns else empty.astype(np.int64),
+                np.concatenate(rows) if rows else empty.astype(np.int64),
+                np.concatenate(alphas) if alphas else empty,
+                np.concatenate(betas) if betas else empty
+            )
+
     class AssetFactorCalculation:
 
         def __init__(self, asset_returns, benchmark_returns, asset, window_length, num_assets):
@@ -228,30 +397,12 @@ class MarketFactorModelQuery:
             # print(rdf.head())
 
             if len(rdf) >= self.window_length:
-                rdf['alpha'] = np.nan
-                rdf['beta'] = np.nan
-
-                for i in range(self.window_length, len(rdf) + 1):
-                    # print('i:', i)
-                    wdf = rdf.iloc[i - self.window_length:i]
-                    # print(len(wdf))
-
-                    y = wdf['return']
-                    x = wdf['market_return']
-                    x = sm.add_constant(x)
-                    model = sm.OLS(y, x).fit()
-
-                    index = rdf.index[i - 1]
-
-                    if model.pvalues.market_return <= 0.05:
-                        rdf.at[index, 'alpha'] = model.params.const
-                        rdf.at[index, 'beta'] = model.params.market_return
-                    else:
-                        rdf.at[index, 'alpha'] = 0
-                        rdf.at[index, 'beta'] = 0
-
-                rdf.dropna(inplace=True)
-                rdf.drop(['return', 'market_return'], axis=1, inplace=True)
+                model = rolling_market_model(rdf['return'].values, rdf['market_return'].values, self.window_length)
+                significant = model.p_value <= MarketFactorModelQuery.SIGNIFICANCE_LEVEL
+
+                rdf['alpha'] = np.where(significant, model.alpha, 0.0)
+                rdf['beta'] = np.where(significant, model.beta, 0.0)
+                rdf = rdf.iloc[self.window_length - 1:].drop(['return', 'market_return'], axis=1)
             else:
                 logger.info('Not enough data to calculate model for: {}'.format(self.asset))
                 rdf = None
@@ -282,3 +433,33 @@ class MarketFactorModelQuery:
             df.sort_index(inplace=True)
 
             return df
+
+
+class SharedReturnsMatrix:
+    """A ``dates x (1 + assets)`` return matrix written once to a memory-mapped file for pool workers.
+
+    Column 0 holds the market returns. The file lives in ``/dev/shm`` when available, so workers map the
+    same pages instead of each receiving a pickled copy of the return panel. Only ``path`` and ``shape`` are
+    pickled when the handle is sent to a worker.
+    """
+
+    SHARED_MEMORY_DIR = '/dev/shm'
+
+    def __init__(self, returns, market_returns):
+        directory = self.SHARED_MEMORY_DIR if os.path.isdir(self.SHARED_MEMORY_DIR) else None
+        fd, self.path = tempfile.mkstemp(suffix='.returns', dir=directory)
+        os.close(fd)
+
+        self.shape = (returns.shape[0], returns.shape[1] + 1)
+        values = np.memmap(self.path, dtype=np.float64, mode='w+', shape=self.shape, order='F')
+        values[:, 0] = market_returns
+        values[:, 1:] = returns
+        values.flush()
+        del values
+
+    def open(self):
+        return np.memmap(self.path, dtype=np.float64, mode='r', shape=self.shape, order='F')
+
+    def close(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
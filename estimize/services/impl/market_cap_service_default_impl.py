@@ -15,13 +15,21 @@ class MarketCapServiceDefaultImpl(MarketCapService):
         self.csv_data_service = csv_data_service
         self.calendar_service = calendar_service
 
+    @property
+    def cache_key(self):
+        return self.cache_service.versioned_key('market_caps', self.url, self._post_func, self.get_market_caps)
+
+    @property
+    def url(self):
+        return '{}/market_caps.csv'.format(cfg.ROOT_DATA_URL)
+
     def get_market_caps(self, start_date=None, end_date=None, assets=None):
-        cache_key = 'market_caps'
-        df = self.cache_service.get(cache_key)
+        cache_key = self.cache_key
+        df = self.cache_service.get(cache_key, start_date, end_date, assets)
 
         if df is None:
             df = self.csv_data_service.get_from_url(
-                url='{}/market_caps.csv'.format(cfg.ROOT_DATA_URL),
+                url=self.url,
                 post_func=self._post_func,
                 date_column='as_of_date',
                 symbol_column='ticker'
@@ -45,10 +53,10 @@ class MarketCapServiceDefaultImpl(MarketCapService):
             df.loc[df['market_cap'].between(2e9, 10e9), 'market_cap_type'] = 'Mid'
             df.loc[df['market_cap'].between(10e9, 200e9), 'market_cap_type'] = 'Large'
             df.loc[df['market_cap'].between(200e9, 12e12), 'market_cap_type'] = 'Mega'
+            df = dfutils.compact_index(df)
 
             self.cache_service.put(cache_key, df)
-
-        df = dfutils.filter(df, start_date, end_date, assets)
+            df = dfutils.filter(df, start_date, end_date, assets)
 
         return df
 
@@ -58,7 +66,7 @@ class MarketCapServiceDefaultImpl(MarketCapService):
         df.index.name = 'as_of_date'
         df.rename(columns={'sid': 'asset'}, inplace=True)
         df.reset_index(inplace=True)
-        df['as_of_date'] = df['as_of_date'].dt.date
+        df['as_of_date'] = dfutils.as_of_dates(df['as_of_date'])
         df.set_index(['as_of_date', 'asset'], inplace=True)
 
-        return df
+        return dfutils.compact_index(df)
@@ -14,26 +14,40 @@ class ReleasesServiceDefaultImpl(ReleasesService):
         self.cache_service = cache_service
         self.asset_info_service = asset_info_service
 
+    @property
+    def cache_key(self):
+        # Derived from asset_info, so a new instruments.csv rebuilds the releases too
+        return self.cache_service.versioned_key(
+            'releases',
+            self.filename,
+            self.asset_info_service.cache_key,
+            self.get_releases
+        )
+
+    @property
+    def filename(self):
+        return os.path.join(cfg.data_dir(), 'releases.csv')
+
     def get_releases(self, start_date=None, end_date=None, assets=None) -> pd.DataFrame:
-        cache_key = 'releases'
-        df = self.cache_service.get(cache_key)
+        cache_key = self.cache_key
+        df = self.cache_service.get(cache_key, start_date, end_date, assets)
 
         if df is None:
             adf = self.asset_info_service.get_asset_info().reset_index()[['asset', 'instrument_id']]
             adf.set_index('instrument_id', inplace=True)
 
-            df = pd.read_csv(os.path.join(cfg.data_dir(), 'releases.csv'))
+            df = pd.read_csv(self.filename)
             df.rename(columns={'id': 'release_id'}, inplace=True)
             df.set_index('instrument_id', inplace=True)
 
             df = df.join(adf, how='inner')
             df.reset_index(inplace=True)
-            df['as_of_date'] = pd.to_datetime(df['reports_at'], format='%Y-%m-%dT%H:%M:%S').dt.tz_localize(
-                'UTC').dt.tz_convert('US/Eastern').dt.date
+            reports_at = pd.to_datetime(df['reports_at'], format='%Y-%m-%dT%H:%M:%S').dt.tz_localize('UTC')
+            df['as_of_date'] = dfutils.as_of_dates(reports_at.dt.tz_convert('US/Eastern'))
             df.set_index(['as_of_date', 'asset'], inplace=True)
+            df = dfutils.compact_index(df)
 
             self.cache_service.put(cache_key, df)
-
-        df = dfutils.filter(df, start_date, end_date, assets)
+            df = dfutils.filter(df, start_date, end_date, assets)
 
         return df
@@ -0,0 +1,144 @@
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+from injector import inject
+
+import estimize.config as cfg
+from estimize.pandas import dfutils
+from estimize.services import ResidualReturnsService, AssetService, CacheService, FactorService
+
+logger = logging.getLogger(__name__)
+
+
+class ResidualReturnsServiceDefaultImpl(ResidualReturnsService):
+    """Open and close returns of every asset with market factors, net of their market model prediction.
+
+    The panel is built once from ``AssetService.get_returns`` and ``FactorService.get_market_factors`` and
+    cached. Residuals use the alpha and beta estimated up to the previous session, so they never look ahead.
+    """
+
+    RETURN_COLUMNS = ['return', 'benchmark_return', 'alpha', 'beta', 'residual_return']
+
+    @inject
+    def __init__(self, cache_service: CacheService, asset_service: AssetService, factor_service: FactorService):
+        self.cache_service = cache_service
+        self.asset_service = asset_service
+        self.factor_service = factor_service
+        self.panels = {}
+        self.lock = threading.Lock()
+
+    @property
+    def cache_key(self):
+        # Returns come from the asset service, a new ingestion of its prices rebuilds the panel
+        return self.cache_service.versioned_key(
+            'residual_returns',
+            self.factor_service.cache_key,
+            self.asset_service.cache_key,
+            cfg.DEFAULT_START_DATE,
+            cfg.DEFAULT_END_DATE,
+            self._build
+        )
+
+    def get_market_neutral_residual_returns(self, start_date=None, end_date=None, assets=None, on='open') -> pd.DataFrame:
+        logger.info('get_market_neutral_residual_returns: start')
+
+        columns = ['{}_{}'.format(on, column) for column in self.RETURN_COLUMNS]
+        cache_key = self.cache_key
+        df = self.cache_service.get(cache_key, start_date, end_date, assets, columns)
+
+        if df is None:
+            df = self._build()
+            self.cache_service.put(cache_key, df)
+            df = dfutils.filter(df, start_date, end_date, assets)[columns]
+
+        df.columns = self.RETURN_COLUMNS
+
+        logger.info('get_market_neutral_residual_returns: end')
+
+        return df
+
+    def get_returns_panel(self, on='open'):
+        with self.lock:
+            panel = self.panels.get(on)
+
+            if panel is None:
+                panel = ReturnsPanel.from_frame(self.get_market_neutral_residual_returns(on=on))
+                self.panels[on] = panel
+
+        return panel
+
+    def _build(self):
+        factors = self.factor_service.get_market_factors()[['alpha', 'beta']].sort_index()
+        assets = self.asset_service.retrieve_assets(dfutils.unique_assets(factors))
+
+        spy = self.asset_service.get_asset('SPY')
+
+        # The benchmark comes from another bundle, one call runs both pipelines concurrently
+        returns = self.asset_service.get_returns(
+            cfg.DEFAULT_START_DATE, cfg.DEFAULT_END_DATE, [asset for asset in assets if asset.symbol != spy.symbol] + [spy]
+        )
+        returns = returns[['open_return', 'close_return']]
+        is_spy = returns.index.get_level_values('asset') == dfutils.asset_key(spy)
+
+        benchmark = returns.iloc[is_spy]
+        returns = returns.iloc[~is_spy]
+        benchmark.reset_index(inplace=True)
+        benchmark.drop(['asset'], axis=1, inplace=True)
+        benchmark.set_index(['as_of_date'], inplace=True)
+
+        # Factors are estimated from a window ending on their own date, use the previous session's
+        factors = factors.groupby(level='asset').shift(1)
+
+        df = returns.join(factors, how='left')
+        df.reset_index(inplace=True)
+        df.set_index(['as_of_date'], inplace=True)
+        df = df.join(benchmark, how='inner', rsuffix='_benchmark')
+        df.reset_index(inplace=True)
+        df.set_index(['as_of_date', 'asset'], inplace=True)
+        df.sort_index(inplace=True)
+
+        for on in ('open', 'close'):
+            df['{}_benchmark_return'.format(on)] = df['{}_return_benchmark'.format(on)]
+            df['{}_alpha'.format(on)] = df['alpha']
+            df['{}_beta'.format(on)] = df['beta']
+            df['{}_residual_return'.format(on)] = df['{}_return'.format(on)] - (
+                df['alpha'] + df['beta'] * df['{}_benchmark_return'.format(on)]
+            )
+
+        return df[['{}_{}'.format(on, column) for on in ('open', 'close') for column in self.RETURN_COLUMNS]]
+
+
+class ReturnsPanel(object):
+    """Asset returns as a ``dates x assets`` matrix plus the benchmark returns of the same dates.
+
+    ``gather`` looks up any number of ``(date, asset)`` pairs at once, which is all an event study needs.
+    """
+
+    def __init__(self, dates, assets, returns, benchmark_returns):
+        self.dates = pd.DatetimeIndex(pd.to_datetime(dates))
+        self.assets = pd.Index(assets)
+        self.returns = returns
+        self.benchmark_returns = benchmark_returns
+
+    @classmethod
+    def from_frame(cls, df):
+        returns = df['return'].unstack('asset')
+        benchmark_returns = df['benchmark_return'].groupby(level='as_of_date').first().reindex(returns.index)
+
+        return cls(returns.index, returns.columns, returns.values, benchmark_returns.values)
+
+    def gather(self, dates, assets):
+        """Returns the asset and benchmark returns of each ``(date, asset)`` pair, NaN where there are none"""
+        rows = self.dates.get_indexer(pd.to_datetime(dates))
+        columns = self.assets.get_indexer(assets)
+
+        returns = np.full(len(rows), np.nan)
+        benchmark_returns = np.full(len(rows), np.nan)
+
+        found = (rows >= 0) & (columns >= 0)
+        returns[found] = self.returns[rows[found], columns[found]]
+        benchmark_returns[rows >= 0] = self.benchmark_returns[rows[rows >= 0]]
+
+        return returns, benchmark_returns
@@ -0,0 +1,96 @@
+import hashlib
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+
+class StaticHTTPServer(ThreadingMixIn, HTTPServer):
+    """Serves ``files`` (a dict of path to bytes) on a local port with HEAD, GET and single byte range requests.
+
+    Good enough to stand in for S3 path style GetObject and HeadObject calls. Every request is recorded in
+    ``requests`` as a ``(method, path, range header)`` tuple. The next GET of a path in ``truncate`` (a dict of
+    path to bytes) drops the connection after that many bytes of the body, like a flaky connection. Requests of a
+    path in ``errors`` (a dict of path to status code) are answered with that status and no body.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, files=None):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), StaticRequestHandler)
+        self.files = {} if files is None else files
+        self.requests = []
+        self.truncate = {}
+        self.errors = {}
+        self.thread = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self.server_address[1])
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        self.thread.join()
+
+
+class StaticRequestHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_HEAD(self):
+        self.respond(body=False)
+
+    def do_GET(self):
+        self.respond(body=True)
+
+    def respond(self, body):
+        path = self.path.split('?')[0]
+        self.server.requests.append((self.command, path, self.headers.get('Range')))
+        content = self.server.files.get(path)
+
+        if content is None or path in self.server.errors:
+            self.send_response(self.server.errors.get(path, 404))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        start, end, status = 0, len(content) - 1, 200
+        match = re.match(r'bytes=(\d*)-(\d*)$', self.headers.get('Range') or '')
+
+        if match is not None:
+            if match.group(1):
+                start = int(match.group(1))
+                end = min(int(match.group(2)), end) if match.group(2) else end
+            else:
+                start = max(len(content) - int(match.group(2)), 0)
+
+            status = 206
+
+        self.send_response(status)
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', '"{}"'.format(hashlib.md5(content).hexdigest()))
+        self.send_header('Last-Modified', 'Mon, 02 Apr 2018 00:00:00 GMT')
+
+        if status == 206:
+            self.send_header('Content-Range', 'bytes {}-{}/{}'.format(start, end, len(content)))
+
+        self.end_headers()
+
+        if body and path in self.server.truncate:
+            self.wfile.write(content[start:start + self.server.truncate.pop(path)])
+            self.close_connection = True
+        elif body:
+            self.wfile.write(content[start:end + 1])
+
+    def log_message(self, format, *args):
+        pass
@@ -1,12 +1,22 @@
+import datetime
+import os
+import shutil
+import tempfile
 import unittest
 
-from estimize.services.impl.cache_service_default_impl import CacheServiceDefaultImpl
+import numpy as np
+import pandas as pd
+
+import estimize.config as cfg
+from estimize.pandas import dfutils
+from estimize.services.impl.cache_service_default_impl import CacheServiceDefaultImpl, ColumnarCache
+from estimize.services.impl.tests.http_server import StaticHTTPServer
 
 
 class TestCacheServiceDefaultImpl(unittest.TestCase):
 
     def setUp(self):
-        self.service = CacheServiceDefaultImpl()
+        self.service = CacheServiceDefaultImpl(read_through=False)
 
     def test_get(self):
         key = 'test'
@@ -15,5 +25,348 @@ class TestCacheServiceDefaultImpl(unittest.TestCase):
         self.assertIsNone(df)
 
 
+class TestCacheServiceDefaultImplMemoryTier(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.service = CacheServiceDefaultImpl(cache_format='columnar', cache_dir=self.cache_dir)
+        self.df = pd.DataFrame({'asset': ['AAPL', 'AMZN'], 'signal': [1.0, 2.0]}).set_index('asset')
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_repeated_get_is_served_from_memory(self):
+        self.service.put('test', self.df)
+
+        df = self.service.get('test')
+        df['signal'] = 0.0
+        df = self.service.get('test')
+
+        self.assertEqual(df['signal'].tolist(), [1.0, 2.0])
+        self.assertEqual(self.service.memory_cache.hits, 1)
+        self.assertEqual(self.service.memory_cache.misses, 1)
+
+    def test_filtered_get_uses_memory(self):
+        self.service.put('test', self.df)
+        self.service.get('test')
+
+        df = self.service.get('test', assets=['AMZN'])
+
+        self.assertEqual(df['signal'].tolist(), [2.0])
+        self.assertEqual(self.service.memory_cache.hits, 1)
+
+    def test_invalidated_when_file_changes(self):
+        self.service.put('test', self.df)
+        self.service.get('test')
+
+        ColumnarCache(self.cache_dir).put('test', self.df * 2)
+        df = self.service.get('test')
+
+        self.assertEqual(df['signal'].tolist(), [2.0, 4.0])
+        self.assertEqual(self.service.memory_cache.misses, 2)
+
+    def test_budget(self):
+        self.service.memory_budget = 1
+        self.service.put('test', self.df)
+        self.service.get('test')
+        self.service.get('test')
+
+        self.assertEqual(self.service.memory_cache.hits, 0)
+        self.assertEqual(self.service.memory_cache.size, 0)
+
+
+class TestColumnarCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.cache = ColumnarCache(self.cache_dir)
+        self.df = pd.DataFrame({
+            'as_of_date': [datetime.date(2017, 1, 3), datetime.date(2017, 1, 3), datetime.date(2017, 1, 4)],
+            'asset': ['AAPL', 'AMZN', 'AAPL'],
+            'reports_at': pd.to_datetime(['2017-01-03 16:30', '2017-01-03 08:00', None]).tz_localize('US/Eastern'),
+            'bmo': [False, True, False],
+            'estimize.eps.mean': [1.25, np.nan, 2.5],
+            'estimize.eps.count': [10, 0, 3],
+            'fiscal_period': ['2017Q1', None, '2017Q2'],
+        }).set_index(['as_of_date', 'asset'])
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_round_trip(self):
+        self.cache.put('test', self.df)
+        df = self.cache.get('test')
+
+        pd.util.testing.assert_frame_equal(df, self.df)
+        self.assertIsInstance(df.index.get_level_values('as_of_date')[0], datetime.date)
+
+    def test_column_subset(self):
+        self.cache.put('test', self.df)
+        df = self.cache.get('test', columns=['estimize.eps.count'])
+
+        self.assertEqual(list(df.columns), ['estimize.eps.count'])
+        self.assertEqual(df.index.names, ['as_of_date', 'asset'])
+        self.assertEqual(df['estimize.eps.count'].tolist(), [10, 0, 3])
+
+    def test_predicate_pushdown(self):
+        random = np.random.RandomState(0)
+        dates = pd.date_range('2016-01-01', periods=600, freq='D', tz='US/Eastern')
+        df = pd.DataFrame({
+            'as_of_date': dates[random.permutation(len(dates))].repeat(3),
+            'asset': ['AAPL', 'AMZN', 'CMG'] * len(dates),
+            'signal': random.normal(size=len(dates) * 3)
+        }).set_index(['as_of_date', 'asset'])
+        self.cache.put('test', df)
+
+        start_date, end_date, assets = '2016-06-01', '2016-12-31', ['AMZN']
+        expected = dfutils.filter(df, start_date, end_date, assets).sort_index()
+        result = self.cache.get('test', start_date, end_date, assets)
+
+        pd.util.testing.assert_frame_equal(result.sort_index(), expected)
+        self.assertEqual(len(result), 214)
+        self.assertTrue(result.index.get_level_values('as_of_date').is_monotonic_increasing)
+
+    def test_asset_pushdown_on_dates(self):
+        self.cache.put('test', self.df)
+        df = self.cache.get('test', assets=['AMZN'])
+
+        self.assertEqual(df.index.get_level_values('asset').tolist(), ['AMZN'])
+        self.assertEqual(df['bmo'].tolist(), [True])
+
+    def test_missing_key(self):
+        self.assertIsNone(self.cache.get('missing'))
+
+    def test_put_chunks(self):
+        chunks = [self.df.iloc[:2], self.df.iloc[2:2], self.df.iloc[2:]]
+        self.cache.put_chunks('test', iter(chunks))
+        df = self.cache.get('test')
+
+        pd.util.testing.assert_frame_equal(df, self.df)
+        self.assertEqual(self.cache.get('test', assets=['AMZN'])['bmo'].tolist(), [True])
+        self.assertEqual(self.cache.CacheItem(self.cache, 'test').meta['sorted_by'], 'as_of_date')
+        self.assertEqual(os.listdir(self.cache_dir), ['test.columns'])
+
+    def test_put_chunks_of_different_encodings(self):
+        df = self.df.copy()
+        df['estimize.eps.count'] = df['estimize.eps.count'].astype(np.float64)
+        df['reports_at_date'] = [datetime.date(2017, 1, 5), datetime.date(2017, 1, 6), np.nan]
+        chunks = [df.iloc[2:], self.df.iloc[:2].assign(reports_at_date=df['reports_at_date'].iloc[:2])]
+
+        self.cache.put_chunks('test', chunks)
+        result = self.cache.get('test')
+
+        pd.util.testing.assert_frame_equal(result, pd.concat(chunks))
+        self.assertIsNone(self.cache.CacheItem(self.cache, 'test').meta['sorted_by'])
+        self.assertEqual(self.cache.get('test', assets=['AMZN'])['reports_at_date'].tolist(), [datetime.date(2017, 1, 6)])
+
+    def test_put_chunks_of_empty_frames(self):
+        self.cache.put_chunks('test', [self.df.iloc[:0]])
+
+        self.assertEqual(len(self.cache.get('test')), 0)
+        self.assertRaises(ValueError, self.cache.put_chunks, 'other', [])
+
+
+class TestCacheServiceDefaultImplVersionedKeys(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.service = CacheServiceDefaultImpl(cache_dir=self.cache_dir, read_through=False)
+        self.source = os.path.join(self.cache_dir, 'source.csv')
+        self.df = pd.DataFrame({'asset': ['AAPL', 'AMZN'], 'signal': [1.0, 2.0]}).set_index('asset')
+
+        with open(self.source, 'w') as f:
+            f.write('asset,signal\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_key_follows_sources(self):
+        key = self.service.versioned_key('test', self.source, len)
+
+        self.assertTrue(key.startswith('test@'))
+        self.assertEqual(self.service.versioned_key('test', self.source, len), key)
+        self.assertNotEqual(self.service.versioned_key('test', self.source, sum), key)
+
+        with open(self.source, 'a') as f:
+            f.write('AAPL,1.0\n')
+
+        self.assertNotEqual(self.service.versioned_key('test', self.source, len), key)
+
+    def test_key_follows_url_etag(self):
+        server = StaticHTTPServer({'/source.csv': b'asset,signal\n'}).start()
+
+        try:
+            url = '{}/source.csv'.format(server.url)
+            key = self.service.versioned_key('test', url)
+
+            self.assertEqual(self.service.versioned_key('test', url), key)
+            self.assertEqual(len(server.requests), 1)
+
+            server.files['/source.csv'] = b'asset,signal\nAAPL,1.0\n'
+            self.assertNotEqual(CacheServiceDefaultImpl(cache_dir=self.cache_dir).versioned_key('test', url), key)
+        finally:
+            server.stop()
+
+    def test_unreachable_url_uses_cached_version(self):
+        key = self.service.versioned_key('test', self.source)
+        self.service.put(key, self.df)
+
+        self.assertEqual(self.service.versioned_key('test', 'http://127.0.0.1:1/source.csv'), key)
+
+    def test_put_replaces_previous_versions(self):
+        old_key = self.service.versioned_key('test', self.source)
+        self.service.put(old_key, self.df)
+        self.service.put('other', self.df)
+
+        with open(self.source, 'a') as f:
+            f.write('AAPL,1.0\n')
+
+        key = self.service.versioned_key('test', self.source)
+        self.assertIsNone(self.service.get(key))
+
+        self.service.put(key, self.df * 2)
+
+        self.assertIsNone(self.service.get(old_key))
+        self.assertEqual(self.service.get(key)['signal'].tolist(), [2.0, 4.0])
+        self.assertEqual(sorted(self.service.local_cache.keys()), sorted([key, 'other']))
+
+
+class TestCacheServiceDefaultImplReadThrough(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.df = pd.DataFrame({
+            'asset': ['AAPL', 'AMZN'] * 5000,
+            'signal': np.arange(10000, dtype=np.float64)
+        }).set_index('asset')
+
+        path = os.path.join(self.cache_dir, 'remote.h5')
+        self.df.to_hdf(path, key='df', mode='w')
+
+        self.source = os.path.join(self.cache_dir, 'source.csv')
+        self.published_source = b'asset,signal\nAAPL,1.0\n'
+
+        with open(path, 'rb') as f:
+            folder = '/{}/research/{}'.format(cfg.S3_DATA_BUCKET, cfg.CURRENT_QUARTER)
+            self.server = StaticHTTPServer({
+                '{}/test.h5'.format(folder): f.read(),
+                '{}/source.csv'.format(folder): self.published_source
+            }).start()
+
+        os.remove(path)
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.cache_dir)
+
+    def service(self, cache_format):
+        service = CacheServiceDefaultImpl(cache_format=cache_format, cache_dir=self.cache_dir, endpoint_url=self.server.url)
+        service.remote_cache.part_size = 64 * 1024
+
+        return service
+
+    def test_local_miss_is_downloaded(self):
+        for cache_format in ('hdf5', 'columnar'):
+            service = self.service(cache_format)
+            df = service.get('test')
+
+            pd.util.testing.assert_frame_equal(df, self.df)
+            self.assertTrue(service.local_cache.exists('test'))
+
+        # One HEAD per cache plus parallel ranged GETs, never a whole object GET
+        methods = [method for method, _, _ in self.server.requests]
+        self.assertEqual(methods.count('HEAD'), 4)
+        self.assertTrue(all(byte_range is not None for method, _, byte_range in self.server.requests if method == 'GET'))
+        self.assertGreater(methods.count('GET'), 2)
+
+    def test_local_hit_skips_remote(self):
+        service = self.service('hdf5')
+        service.get('test')
+        requests = len(self.server.requests)
+
+        service = self.service('hdf5')
+        service.get('test')
+
+        self.assertEqual(len(self.server.requests), requests)
+
+    def test_versioned_key_reads_published_dataset(self):
+        service = self.service('hdf5')
+        df = service.get(service.versioned_key('test', 'source'))
+
+        pd.util.testing.assert_frame_equal(df, self.df)
+
+    def test_published_source_reads_published_dataset(self):
+        with open(self.source, 'wb') as f:
+            f.write(self.published_source)
+
+        service = self.service('hdf5')
+        df = service.get(service.versioned_key('test', self.source))
+
+        pd.util.testing.assert_frame_equal(df, self.df)
+
+    def test_local_source_differing_from_published_one_is_built_locally(self):
+        with open(self.source, 'wb') as f:
+            f.write(self.published_source + b'AMZN,2.0\n')
+
+        service = self.service('hdf5')
+        key = service.versioned_key('test', self.source)
+
+        self.assertIsNone(service.get(key))
+        self.assertFalse(service.local_cache.exists(key))
+        self.assertNotIn('/test.h5', [path[-len('/test.h5'):] for _, path, _ in self.server.requests])
+
+    def test_dataset_derived_from_published_source_reads_published_dataset(self):
+        with open(self.source, 'wb') as f:
+            f.write(self.published_source)
+
+        service = self.service('hdf5')
+        df = service.get(service.versioned_key('test', service.versioned_key('source', self.source), len))
+
+        pd.util.testing.assert_frame_equal(df, self.df)
+
+    def test_dataset_derived_from_unpublished_source_is_built_locally(self):
+        with open(self.source, 'wb') as f:
+            f.write(self.published_source + b'AMZN,2.0\n')
+
+        service = self.service('hdf5')
+        key = service.versioned_key('test', service.versioned_key('source', self.source), len)
+
+        self.assertIsNone(service.get(key))
+        self.assertNotIn('/test.h5', [path[-len('/test.h5'):] for _, path, _ in self.server.requests])
+
+    def test_dataset_derived_from_unknown_key_is_built_locally(self):
+        service = self.service('hdf5')
+        key = service.versioned_key('test', 'source@0123456789abcdef')
+
+        self.assertIsNone(service.get(key))
+        self.assertEqual(self.server.requests, [])
+
+    def test_compact_index_is_built_locally(self):
+        compact_index = cfg.COMPACT_INDEX
+        cfg.COMPACT_INDEX = True
+
+        try:
+            service = self.service('hdf5')
+
+            self.assertIsNone(service.get(service.versioned_key('test', 'source')))
+            self.assertEqual(self.server.requests, [])
+        finally:
+            cfg.COMPACT_INDEX = compact_index
+
+    def test_remote_error_disables_read_through(self):
+        service = self.service('hdf5')
+        self.server.errors['/{}/research/{}/test.h5'.format(cfg.S3_DATA_BUCKET, cfg.CURRENT_QUARTER)] = 400
+
+        self.assertIsNone(service.get('test'))
+        self.assertFalse(service.read_through)
+
+    def test_remote_miss(self):
+        service = self.service('hdf5')
+
+        self.assertIsNone(service.get('missing'))
+        self.assertEqual(self.server.requests[-1][0], 'HEAD')
+        self.assertEqual(os.listdir(self.cache_dir), [])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,11 +1,15 @@
+import datetime
 import unittest
 import logging
+from collections import OrderedDict
 from injector import Injector
 import pandas as pd
 
 from estimize.di.default_module import DefaultModule
 from estimize.services import EstimizeConsensusService, AssetService
 from estimize.services.impl import EventStudyServiceDefaultImpl
+from estimize.services.impl.event_study_service_default_impl import EventStudy, EventStudyInputs
+from estimize.services.impl.zipline import CalendarServiceZiplineImpl
 from estimize.logging import configure_logging
 
 
@@ -45,6 +49,155 @@ class TestEventStudyServiceDefaultImpl(unittest.TestCase):
 
         print(df)
 
+    def test_run_event_study_with_confidence_intervals(self):
+        start_date = '2016-01-01'
+        end_date = '2017-01-01'
+        aapl = self.asset_service.get_asset('AAPL')
+        events = self.estimize_consensus_service.get_final_consensuses(start_date, end_date, [aapl])
+        events = events[[]]
+        df = self.service.run_event_study(events=events, confidence=0.95, bootstrap_draws=200)
+
+        self.assertTrue((df['cumulative_residual_return_lower'] <= df['cumulative_residual_return_upper']).all())
+        self.assertIn('cumulative_residual_return_t_stat', df.columns)
+        pd.util.testing.assert_frame_equal(
+            df, self.service.run_event_study(events=events, confidence=0.95, bootstrap_draws=200)
+        )
+
+    def test_run_event_study_in_chunks(self):
+        start_date = '2016-01-01'
+        end_date = '2017-01-01'
+        aapl = self.asset_service.get_asset('AAPL')
+        events = self.estimize_consensus_service.get_final_consensuses(start_date, end_date, [aapl])
+        events = events[[]]
+        expected = self.service.run_event_study(events=events, confidence=0.95)
+        expected = expected.drop(['cumulative_residual_return_lower', 'cumulative_residual_return_upper'], axis=1)
+
+        df = self.service.run_event_study(events=events, confidence=0.95, chunk_size=2)
+
+        pd.util.testing.assert_frame_equal(df, expected, check_less_precise=True)
+
+    def test_run_event_studies(self):
+        start_date = '2016-01-01'
+        end_date = '2017-01-01'
+        aapl = self.asset_service.get_asset('AAPL')
+        events = self.estimize_consensus_service.get_final_consensuses(start_date, end_date, [aapl])
+        events = events[[]]
+        studies = OrderedDict([
+            ('open', {'events': events}),
+            ('close', {'events': events, 'on': 'close', 'days_before': 5, 'days_after': 3})
+        ])
+
+        results = self.service.run_event_studies(studies)
+
+        self.assertEqual(list(results), ['open', 'close'])
+        pd.util.testing.assert_frame_equal(results['open'], self.service.run_event_study(events=events))
+        pd.util.testing.assert_frame_equal(results['close'], self.service.run_event_study(events, 'close', 5, 3))
+
+
+class TestEventStudyWindowedEvents(unittest.TestCase):
+
+    class Config:
+
+        class TradingCalendar:
+            all_sessions = pd.bdate_range('2016-01-01', '2018-12-31', tz='UTC')
+
+        trading_calendar = TradingCalendar()
+
+    class FactorService:
+
+        def get_market_factors(self, start_date, end_date, assets):
+            dates = pd.bdate_range('2017-01-02', '2017-03-31').date
+            index = pd.MultiIndex.from_product([dates, assets], names=['as_of_date', 'asset'])
+
+            return pd.DataFrame({'alpha': 0.001, 'beta': 1.0}, index=index)
+
+    def test_windowed_events(self):
+        events = pd.DataFrame({
+            'as_of_date': [datetime.date(2017, 2, 6), datetime.date(2017, 2, 13)],
+            'asset': ['AAPL', 'AMZN'],
+            'year': [2017, 2017]
+        }).set_index(['as_of_date', 'asset'])
+
+        calendar_service = CalendarServiceZiplineImpl(self.Config())
+        df = EventStudy(calendar_service, self.FactorService(), None, events, 'open', 3, 2).windowed_events
+
+        aapl = df.xs('AAPL', level='asset')
+        self.assertEqual(aapl['event_time'].tolist(), [-3, -2, -1, 0, 1, 2])
+        self.assertEqual(aapl.index[0], datetime.date(2017, 2, 1))
+        self.assertEqual(aapl.index[-1], datetime.date(2017, 2, 8))
+        self.assertEqual(df.xs('AMZN', level='asset').index[0], datetime.date(2017, 2, 8))
+        self.assertTrue((df['year'] == 2017).all())
+        self.assertEqual(len(df), 12)
+
+
+class TestEventStudyChunkedResults(unittest.TestCase):
+
+    def test_no_events(self):
+        events = pd.DataFrame({
+            'as_of_date': [],
+            'asset': [],
+            'year': []
+        }).set_index(['as_of_date', 'asset'])
+
+        df = EventStudy(None, None, None, events, confidence=0.95, chunk_size=2).results()
+
+        self.assertTrue(df.empty)
+        self.assertEqual(df.index.names, ['year', 'event_time'])
+        self.assertEqual(list(df.columns), [
+            'residual_return',
+            'count',
+            'cumulative_residual_return',
+            'residual_return_std_error',
+            'residual_return_t_stat',
+            'cumulative_residual_return_std_error',
+            'cumulative_residual_return_t_stat'
+        ])
+
+        df = EventStudy(None, None, None, events[[]], chunk_size=2).results()
+
+        self.assertEqual(df.index.name, 'event_time')
+        self.assertEqual(list(df.columns), ['residual_return', 'count', 'cumulative_residual_return'])
+
+
+class TestEventStudyInputs(unittest.TestCase):
+
+    class EventStudy(EventStudy):
+
+        def build_windowed_events(self):
+            self.builds.append(self.on)
+
+            return pd.DataFrame({'event_time': [-1, 0, 1]})
+
+    def test_shared_windows(self):
+        events = pd.DataFrame({'as_of_date': [datetime.date(2017, 2, 6)], 'asset': ['AAPL']})
+        events = events.set_index(['as_of_date', 'asset'])
+        builds = []
+
+        def study(events, on, days_before=3, chunk_size=None):
+            event_study = self.EventStudy(None, None, None, events, on, days_before, 2, chunk_size=chunk_size)
+            event_study.builds = builds
+
+            return event_study
+
+        studies = [
+            study(events, 'open'),
+            study(events, 'close'),
+            study(events, 'open', days_before=5),
+            study(events, 'close', chunk_size=2),
+            study(events.copy(), 'open')
+        ]
+        inputs = EventStudyInputs(None, studies)
+
+        for event_study in studies:
+            event_study.inputs = inputs
+            df = event_study.windowed_events
+            df['residual_return'] = 0.0
+
+            self.assertEqual(df['event_time'].tolist(), [-1, 0, 1])
+
+        self.assertEqual(builds, ['open', 'open', 'close', 'open'])
+        self.assertEqual(inputs.windows, {})
+
 
 if __name__ == '__main__':
     unittest.main()
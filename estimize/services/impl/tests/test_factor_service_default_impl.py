@@ -1,11 +1,16 @@
 import logging
+import os
+import shutil
+import tempfile
 import unittest
 
 from injector import Injector
+import pandas as pd
 
 from estimize.di.default_module import DefaultModule
 from estimize.logging import configure_logging
 from estimize.services import FactorService, AssetService
+from estimize.services.impl import FactorServiceDefaultImpl
 
 
 class TestFactorServiceDefaultImpl(unittest.TestCase):
@@ -28,5 +33,47 @@ class TestFactorServiceDefaultImpl(unittest.TestCase):
         print(df)
 
 
+class TestFactorServiceDefaultImplBuildMarketFactors(unittest.TestCase):
+
+    class CalendarService:
+
+        sessions = pd.bdate_range('2018-03-26', '2018-03-30')
+
+        def get_n_trading_days_from(self, n, date):
+            return list(self.sessions[self.sessions > date][:n])
+
+        def get_valid_trading_end_date(self, date):
+            return self.sessions[-1]
+
+    class EstimizeConsensusService:
+
+        def get_final_consensuses(self):
+            raise AssertionError('Market factors are up to date')
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.root_dir = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.root_dir, 'data'))
+        os.chdir(self.root_dir)
+
+        self.service = FactorServiceDefaultImpl(None, self.EstimizeConsensusService(), self.CalendarService(), None, None)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        shutil.rmtree(self.root_dir)
+
+    def test_up_to_date_on_last_session(self):
+        path = os.path.join(self.root_dir, 'data', 'market_factors.csv')
+
+        with open(path, 'w') as f:
+            f.write('as_of_date,ticker,alpha,beta\n')
+            f.write('2018-03-30,AAPL,0.0,1.0\n')
+
+        self.service.build_market_factors(panel=True)
+
+        with open(path) as f:
+            self.assertEqual(len(f.readlines()), 2)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,9 +1,16 @@
+import os
+import shutil
+import tempfile
 import unittest
 
 from injector import Injector
+import numpy as np
+import pandas as pd
 
+import estimize.config as cfg
 from estimize.di.default_module import DefaultModule
 from estimize.services import AssetService, ReleasesService
+from estimize.services.impl import CacheServiceDefaultImpl, ReleasesServiceDefaultImpl
 
 
 class TestReleasesServiceDefaultImpl(unittest.TestCase):
@@ -25,5 +32,53 @@ class TestReleasesServiceDefaultImpl(unittest.TestCase):
         print(df)
 
 
+class TestReleasesServiceDefaultImplCompactIndex(unittest.TestCase):
+
+    class AssetInfoService:
+
+        cache_key = 'asset_info'
+
+        def get_asset_info(self):
+            return pd.DataFrame({'instrument_id': [1, 2]}, index=pd.Index(np.array([24, 5061]), name='asset'))
+
+    class Service(ReleasesServiceDefaultImpl):
+
+        filename = None
+
+    def setUp(self):
+        self.compact_index = cfg.COMPACT_INDEX
+        cfg.COMPACT_INDEX = True
+
+        self.cache_dir = tempfile.mkdtemp()
+        self.service = self.Service(
+            CacheServiceDefaultImpl(cache_dir=self.cache_dir, read_through=False),
+            self.AssetInfoService()
+        )
+        self.service.filename = os.path.join(self.cache_dir, 'releases.csv')
+
+        with open(self.service.filename, 'w') as f:
+            f.write('id,instrument_id,reports_at\n')
+            f.write('10,1,2017-01-31T21:30:00\n')
+            f.write('11,2,2017-02-01T03:30:00\n')
+            f.write('12,3,2017-02-01T12:00:00\n')
+
+    def tearDown(self):
+        cfg.COMPACT_INDEX = self.compact_index
+        shutil.rmtree(self.cache_dir)
+
+    def test_get_releases(self):
+        df = self.service.get_releases()
+
+        dates = df.index.get_level_values('as_of_date')
+        self.assertEqual(dates.dtype.kind, 'M')
+        self.assertEqual(dates.tolist(), [pd.Timestamp('2017-01-31'), pd.Timestamp('2017-01-31')])
+        self.assertEqual(df.index.get_level_values('asset').tolist(), [24, 5061])
+        self.assertEqual(df['release_id'].tolist(), [10, 11])
+
+        df = self.service.get_releases(start_date='2017-01-31', assets=[5061])
+
+        self.assertEqual(df['release_id'].tolist(), [11])
+
+
 if __name__ == '__main__':
     unittest.main()
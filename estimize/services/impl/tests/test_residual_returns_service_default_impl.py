@@ -1,9 +1,13 @@
+import datetime
 import unittest
 import logging
 from injector import Injector
+import numpy as np
+import pandas as pd
 
 from estimize.di.default_module import DefaultModule
 from estimize.services.impl import ResidualReturnsServiceDefaultImpl
+from estimize.services.impl.residual_returns_service_default_impl import ReturnsPanel
 from estimize.logging import configure_logging
 
 
@@ -21,6 +25,34 @@ class TestResidualReturnsServiceDefaultImpl(unittest.TestCase):
 
         self.assertIsNotNone(df)
         self.assertFalse(df.empty)
+        self.assertEqual(list(df.columns), ['return', 'benchmark_return', 'alpha', 'beta', 'residual_return'])
+
+    def test_returns_panel(self):
+        panel = self.service.get_returns_panel(on='close')
+
+        self.assertEqual(panel.returns.shape, (len(panel.dates), len(panel.assets)))
+        self.assertTrue(panel.dates.is_monotonic_increasing)
+
+
+class TestReturnsPanel(unittest.TestCase):
+
+    def test_gather(self):
+        dates = [datetime.date(2017, 1, 3), datetime.date(2017, 1, 4)]
+        df = pd.DataFrame({
+            'as_of_date': [dates[0], dates[0], dates[1]],
+            'asset': ['AAPL', 'AMZN', 'AAPL'],
+            'return': [0.01, 0.02, 0.03],
+            'benchmark_return': [0.001, 0.001, 0.002]
+        }).set_index(['as_of_date', 'asset'])
+        panel = ReturnsPanel.from_frame(df)
+
+        returns, benchmark_returns = panel.gather(
+            [dates[1], dates[1], dates[0], datetime.date(2017, 1, 5)],
+            ['AAPL', 'AMZN', 'AMZN', 'AAPL']
+        )
+
+        np.testing.assert_array_equal(returns, [0.03, np.nan, 0.02, np.nan])
+        np.testing.assert_array_equal(benchmark_returns, [0.002, 0.002, 0.001, np.nan])
 
 
 if __name__ == '__main__':
@@ -1,4 +1,5 @@
 from .config import Config, YahooConfig
 from .asset_service_zipline_impl import AssetServiceZiplineImpl
 from .calendar_service_zipline_impl import CalendarServiceZiplineImpl
+from .symbol_service_zipline_impl import SymbolServiceZiplineImpl
 from .csv_data_service_zipline_impl import CsvDataServiceZiplineImpl
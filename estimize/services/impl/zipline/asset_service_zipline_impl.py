@@ -1,127 +1,247 @@
+import numbers
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 from injector import inject
 from memoized_property import memoized_property
+import numpy as np
 import pandas as pd
 from zipline.pipeline import Pipeline
 from zipline.pipeline.data import USEquityPricing
 from zipline.pipeline.factors import AverageDollarVolume, Returns, SimpleMovingAverage
 from zipline.pipeline.filters import StaticAssets
 
-from estimize.services import AssetService, CalendarService
+import estimize.config as cfg
+from estimize.pandas import dfutils
+from estimize.services import AssetService, CacheService, CalendarService
 from estimize.services.impl.zipline import Config, YahooConfig
 from estimize.zipline.pipeline.factors.technical import InterDayReturns, IntraDayReturns
 
 
 class AssetServiceZiplineImpl(AssetService):
+    """Assets of the quandl bundle plus the ``YAHOO_TICKERS`` of the yahoo bundle.
+
+    Requests mixing assets of both bundles are split by bundle, run concurrently and merged, so a benchmark
+    and the assets it is compared with come back from a single call.
+    """
 
     @inject
-    def __init__(self, config: Config, yahoo_config: YahooConfig, calendar_service: CalendarService):
+    def __init__(self, config: Config, yahoo_config: YahooConfig, calendar_service: CalendarService,
+                 cache_service: CacheService):
         self.config = config
         self.yahoo_config = yahoo_config
         self.calendar_service = calendar_service
+        self.cache_service = cache_service
+
+    @property
+    def cache_key(self):
+        return self.cache_service.versioned_key(
+            'assets',
+            self.asset_service.cache_key,
+            self.yahoo_asset_service.cache_key
+        )
 
     def get_assets(self, tickers):
-        return self.get_service(tickers).get_assets(tickers)
+        tickers = list(tickers)
+        assets = [None] * len(tickers)
+
+        for service, positions in self._group(tickers, lambda ticker: ticker):
+            for i, asset in zip(positions, service.get_assets([tickers[i] for i in positions])):
+                assets[i] = asset
+
+        return assets
+
+    def retrieve_assets(self, assets):
+        """Assets of ``assets``, sids are looked up in the bundle they belong to and assets kept as they are"""
+        assets = list(assets)
+        sids = [i for i, asset in enumerate(assets) if isinstance(asset, numbers.Integral)]
+        yahoo = [i for i in sids if assets[i] >= self.yahoo_config.FIRST_SID]
+        quandl = [i for i in sids if assets[i] < self.yahoo_config.FIRST_SID]
+
+        for service, positions in ((self.asset_service, quandl), (self.yahoo_asset_service, yahoo)):
+            if len(positions) == 0:
+                continue
+
+            for i, asset in zip(positions, service.retrieve_assets([assets[i] for i in positions])):
+                assets[i] = asset
+
+        return assets
 
     def get_moving_average(self, start_date, end_date, assets=None, window_length=63) -> pd.DataFrame:
-        return self.get_service(self.get_tickers(assets)).get_moving_average(start_date, end_date, assets, window_length)
+        return self._federate('get_moving_average', assets, start_date, end_date, window_length=window_length)
 
     def get_returns(self, start_date, end_date, assets=None) -> pd.DataFrame:
-        return self.get_service(self.get_tickers(assets)).get_returns(start_date, end_date, assets)
+        return self._federate('get_returns', assets, start_date, end_date)
 
     def get_universe(self, start_date, end_date, assets=None, min_avg_dollar_vol=1e6, min_price=4.0) -> pd.DataFrame:
-        return self.asset_service.get_universe(start_date, end_date, assets, min_avg_dollar_vol, min_price)
+        assets = None if assets is None else self.retrieve_assets(assets)
 
-    def get_service(self, tickers):
-        if len(self.yahoo_config.YAHOO_TICKERS.intersection(tickers)) > 0:
-            return self.yahoo_asset_service
-        else:
-            return self.asset_service
-
-    @staticmethod
-    def get_tickers(assets):
-        if assets is not None:
-            return set(asset.symbol for asset in assets)
-        else:
-            return set()
+        return self.asset_service.get_universe(start_date, end_date, assets, min_avg_dollar_vol, min_price)
 
     @memoized_property
     def asset_service(self):
-        return AssetServiceZiplineConfigImpl(self.config, self.calendar_service)
+        return AssetServiceZiplineConfigImpl(self.config, self.calendar_service, self.cache_service)
 
     @memoized_property
     def yahoo_asset_service(self):
-        return AssetServiceZiplineConfigImpl(self.yahoo_config, self.calendar_service)
+        return AssetServiceZiplineConfigImpl(self.yahoo_config, self.calendar_service, self.cache_service)
+
+    def _federate(self, method, assets, *args, **kwargs):
+        if assets is None:
+            return getattr(self.asset_service, method)(*args, assets=None, **kwargs)
+
+        # Sids of compact frames are turned back into assets, pipelines screen on assets
+        assets = self.retrieve_assets(assets)
+        groups = [(service, [assets[i] for i in positions])
+                  for service, positions in self._group(assets, lambda asset: asset.symbol)]
+
+        if len(groups) == 1:
+            service, service_assets = groups[0]
+            return getattr(service, method)(*args, assets=service_assets, **kwargs)
+
+        self._check_sids(groups)
+
+        with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+            futures = [
+                executor.submit(getattr(service, method), *args, assets=service_assets, **kwargs)
+                for service, service_assets in groups
+            ]
+            df = pd.concat([future.result() for future in futures])
+
+        df.sort_index(inplace=True)
+
+        return df
+
+    def _group(self, values, ticker):
+        """Positions of the ``values`` held by each bundle, the quandl bundle when there are none at all"""
+        yahoo = [i for i, value in enumerate(values) if ticker(value) in self.yahoo_config.YAHOO_TICKERS]
+        quandl = [i for i, value in enumerate(values) if ticker(value) not in self.yahoo_config.YAHOO_TICKERS]
+        groups = [(service, positions) for service, positions in
+                  ((self.asset_service, quandl), (self.yahoo_asset_service, yahoo)) if len(positions) > 0]
+
+        return groups or [(self.asset_service, [])]
+
+    @staticmethod
+    def _check_sids(groups):
+        # Assets are compared by sid, results of bundles sharing sids can't be told apart once merged
+        seen = set()
+
+        for service, assets in groups:
+            sids = set(asset.sid for asset in assets)
+
+            if seen.intersection(sids):
+                raise ValueError(
+                    "Bundle '{}' has sids {} in common with another bundle, re-ingest it to request them together"
+                    .format(service.config.bundle_name, sorted(seen.intersection(sids)))
+                )
+
+            seen.update(sids)
 
 
 class AssetServiceZiplineConfigImpl(AssetService):
+    """Pipeline queries against the bundle of ``config``.
+
+    Pipeline results are cached per bundle ingestion and pipeline. A run is served from the cache when a
+    previous one covered its sessions and assets, otherwise it is widened to the union of both and the cached
+    result replaced, so repeated and overlapping queries don't read the daily bars again. Runs are streamed into
+    the cache chunk by chunk, with the columnar format only one chunk is held in memory at a time.
+    """
 
-    def __init__(self, config: Config, calendar_service: CalendarService):
+    ALL_ASSETS = '*'
+
+    def __init__(self, config: Config, calendar_service: CalendarService, cache_service: CacheService):
         self.config = config
         self.calendar_service = calendar_service
+        self.cache_service = cache_service
+        self.lock = threading.RLock()
+
+    @property
+    def cache_key(self):
+        # Prices change with every ingestion of the bundle
+        return self.cache_service.versioned_key(
+            'assets_{}'.format(self.config.bundle_name),
+            self.config.ingest_timestamp
+        )
 
     def get_assets(self, tickers):
         return self.asset_finder.lookup_symbols(tickers, None)
 
+    def retrieve_assets(self, assets):
+        assets = list(assets)
+        positions = [i for i, asset in enumerate(assets) if isinstance(asset, numbers.Integral)]
+
+        for i, asset in zip(positions, self.asset_finder.retrieve_all([int(assets[i]) for i in positions])):
+            assets[i] = asset
+
+        return assets
+
     def get_moving_average(self, start_date, end_date, assets=None, window_length=63):
-        moving_average = SimpleMovingAverage(inputs=[USEquityPricing.close], window_length=window_length)
+        def make_pipeline(assets):
+            moving_average = SimpleMovingAverage(inputs=[USEquityPricing.close], window_length=window_length)
 
-        pipeline = Pipeline(
-            columns={
-                'moving_average': moving_average
-            }
-        )
+            pipeline = Pipeline(
+                columns={
+                    'moving_average': moving_average
+                }
+            )
+
+            if assets is not None:
+                pipeline.set_screen(StaticAssets(assets))
 
-        if assets is not None:
-            pipeline.set_screen(StaticAssets(assets))
+            return pipeline
 
-        df = self._run_pipeline(pipeline, start_date, end_date)
+        df = self._run_cached_pipeline(make_pipeline, start_date, end_date, assets, 'moving_average', window_length)
 
         return df
 
     def get_returns(self, start_date, end_date, assets=None):
-        open_return = Returns(window_length=2, inputs=[USEquityPricing.open])
-        close_return = Returns(window_length=2, inputs=[USEquityPricing.close])
-        inter_day_return = InterDayReturns()
-        intra_day_return = IntraDayReturns()
-
-        pipeline = Pipeline(
-            columns={
-                'open_return': open_return,
-                'close_return': close_return,
-                'inter_day_return': inter_day_return,
-                'intra_day_return': intra_day_return
-            }
-        )
-
-        if assets is not None:
-            pipeline.set_screen(StaticAssets(assets))
-
-        df = self._run_pipeline(pipeline, start_date, end_date)
+        def make_pipeline(assets):
+            open_return = Returns(window_length=2, inputs=[USEquityPricing.open])
+            close_return = Returns(window_length=2, inputs=[USEquityPricing.close])
+            inter_day_return = InterDayReturns()
+            intra_day_return = IntraDayReturns()
+
+            pipeline = Pipeline(
+                columns={
+                    'open_return': open_return,
+                    'close_return': close_return,
+                    'inter_day_return': inter_day_return,
+                    'intra_day_return': intra_day_return
+                }
+            )
+
+            if assets is not None:
+                pipeline.set_screen(StaticAssets(assets))
+
+            return pipeline
+
+        df = self._run_cached_pipeline(make_pipeline, start_date, end_date, assets, 'returns')
         df['open_return'] = df.groupby(df.index.get_level_values('asset'))['open_return'].shift(-1)
         df.dropna(inplace=True)
 
         return df
 
     def get_universe(self, start_date, end_date, assets=None, min_avg_dollar_vol=1e6, min_price=4.0):
-        adv = AverageDollarVolume(window_length=20)
-        latest_close = USEquityPricing.close.latest
-
-        # min_market_cap = market_cap >= 100e6 # Need market cap data
-        min_adv = (adv >= min_avg_dollar_vol)
-        min_latest_close = (latest_close >= min_price)
-        screen = (min_adv & min_latest_close)
-
-        if assets is not None:
-            screen = (StaticAssets(assets) & screen)
-
-        pipeline = Pipeline(
-            columns={
-                'latest_close': latest_close
-            },
-            screen=screen
-        )
-
-        df = self._run_pipeline(pipeline, start_date, end_date)
+        def make_pipeline(assets):
+            adv = AverageDollarVolume(window_length=20)
+            latest_close = USEquityPricing.close.latest
+
+            # min_market_cap = market_cap >= 100e6 # Need market cap data
+            min_adv = (adv >= min_avg_dollar_vol)
+            min_latest_close = (latest_close >= min_price)
+            screen = (min_adv & min_latest_close)
+
+            if assets is not None:
+                screen = (StaticAssets(assets) & screen)
+
+            return Pipeline(
+                columns={
+                    'latest_close': latest_close
+                },
+                screen=screen
+            )
+
+        df = self._run_cached_pipeline(make_pipeline, start_date, end_date, assets, 'universe', min_avg_dollar_vol, min_price)
         df.drop(['latest_close'], axis=1, inplace=True)
 
         return df
@@ -138,17 +258,98 @@ class AssetServiceZiplineConfigImpl(AssetService):
     def trading_calendar(self):
         return self.config.trading_calendar
 
-    def _run_pipeline(self, pipeline, start_date, end_date):
-        start_date = self.calendar_service.get_valid_trading_start_date(start_date).tz_localize('UTC')
-        end_date = self.calendar_service.get_valid_trading_end_date(end_date).tz_localize('UTC')
-
-        df = self.pipeline_engine.run_pipeline(pipeline, start_date, end_date)
-        df.index.rename(['as_of_date', 'asset'], inplace=True)
-        df.reset_index(inplace=True)
-        df = pd.pivot_table(df, index='as_of_date', columns='asset')
-        df = df.shift(-1).stack()
-        df.reset_index(inplace=True)
-        df['as_of_date'] = df['as_of_date'].dt.date
-        df.set_index(['as_of_date', 'asset'], inplace=True)
+    def _run_cached_pipeline(self, make_pipeline, start_date, end_date, assets, *terms):
+        start_date = self.calendar_service.get_valid_trading_start_date(start_date)
+        end_date = self.calendar_service.get_valid_trading_end_date(end_date)
+
+        # Versions of a name replace each other, every term is part of it so different queries are kept side by side
+        name = 'pipeline_{}_{}'.format(self.config.bundle_name, '_'.join(str(term) for term in terms))
+        sources = (self.config.ingest_timestamp, terms, make_pipeline, self._run_pipeline)
+        cache_key = self.cache_service.versioned_key(name, *sources)
+        coverage_key = self.cache_service.versioned_key('{}_coverage'.format(name), *sources)
+
+        with self.lock:
+            coverage = self.cache_service.get(coverage_key) if self.cache_service.exists(cache_key) else None
+
+            if not self._covers(coverage, start_date, end_date, assets):
+                run_start_date, run_end_date, run_assets = start_date, end_date, assets
+
+                if coverage is not None:
+                    run_start_date = min(start_date, coverage['start_date'].iloc[0])
+                    run_end_date = max(end_date, coverage['end_date'].iloc[0])
+                    run_assets = self._union(coverage.index, assets)
+
+                # Chunks are streamed into the cache, only the requested rows are read back below
+                chunks = self._run_pipeline_chunks(make_pipeline(run_assets), run_start_date, run_end_date)
+                self.cache_service.put_chunks(cache_key, chunks)
+                self.cache_service.put(coverage_key, self._coverage(run_start_date, run_end_date, run_assets))
+
+        # Results are labelled with the session before the one they were computed on
+        label_end_date = self.calendar_service.shift_sessions([end_date], -1)[0]
+
+        df = self.cache_service.get(cache_key, start_date, label_end_date, assets)
+
+        # Pipelines screen and cache on assets and datetime64 dates, results take the index of the other
+        # services as they are read
+        return dfutils.compact_index(dfutils.as_of_date_level(df))
+
+    def _covers(self, coverage, start_date, end_date, assets):
+        if coverage is None:
+            return False
+
+        if start_date < coverage['start_date'].iloc[0] or end_date > coverage['end_date'].iloc[0]:
+            return False
+
+        if self.ALL_ASSETS in coverage.index:
+            return True
+
+        return assets is not None and bool(pd.Index(assets).isin(coverage.index).all())
+
+    def _union(self, covered_assets, assets):
+        if assets is None or self.ALL_ASSETS in covered_assets:
+            return None
+
+        covered_assets = list(covered_assets)
+        covered = set(covered_assets)
+
+        return covered_assets + [asset for asset in assets if asset not in covered]
+
+    def _coverage(self, start_date, end_date, assets):
+        index = pd.Index([self.ALL_ASSETS] if assets is None else list(assets), dtype=object, name='asset')
+
+        return pd.DataFrame({
+            'start_date': np.repeat(np.datetime64(start_date, 'ns'), len(index)),
+            'end_date': np.repeat(np.datetime64(end_date, 'ns'), len(index))
+        }, index=index, columns=['start_date', 'end_date'])
+
+    def _run_pipeline(self, pipeline, start_date, end_date, chunk_sessions=cfg.PIPELINE_CHUNK_SESSIONS):
+        dfs = list(self._run_pipeline_chunks(pipeline, start_date, end_date, chunk_sessions))
+
+        return dfs[0] if len(dfs) == 1 else pd.concat(dfs)
+
+    def _run_pipeline_chunks(self, pipeline, start_date, end_date, chunk_sessions=cfg.PIPELINE_CHUNK_SESSIONS):
+        """Yields the results of ``pipeline`` for consecutive ranges of at most ``chunk_sessions`` sessions.
+
+        zipline loads the lookback window terms need for every chunk itself. Each chunk runs one session into
+        the next one, as the values of that session are labelled with the last session of the chunk.
+        """
+        sessions = self.calendar_service.get_sessions_between(start_date, end_date)
+
+        if len(sessions) == 0:
+            raise ValueError('No sessions between {} and {}'.format(start_date, end_date))
+
+        for i in range(0, max(len(sessions) - 1, 1), chunk_sessions):
+            yield self._run_pipeline_chunk(pipeline, sessions[i], sessions[min(i + chunk_sessions, len(sessions) - 1)])
+
+    def _run_pipeline_chunk(self, pipeline, start_date, end_date):
+        df = self.pipeline_engine.run_pipeline(pipeline, start_date.tz_localize('UTC'), end_date.tz_localize('UTC'))
+
+        # Values computed on a session only use data up to the previous one, so they are labelled with it.
+        # Only the unique dates of the index are shifted, the rows themselves are left in place.
+        sessions = self.calendar_service.shift_sessions(df.index.levels[0], -1)
+        df.index = df.index.set_levels(sessions, level=0)
+        df.index.names = ['as_of_date', 'asset']
+        df = df.iloc[df.index.get_level_values('as_of_date') >= start_date]
+        df = df.dropna(how='all')
 
         return df
@@ -1,52 +1,119 @@
+import numpy as np
 import pandas as pd
 from injector import inject
+from memoized_property import memoized_property
 
 from estimize.services import CalendarService
 from . import Config
 
 
 class CalendarServiceZiplineImpl(CalendarService):
+    """Trading day arithmetic on the sessions of the zipline calendar.
+
+    Sessions are held as one sorted array along with, for every calendar day they span, the ordinal of the
+    first session on or after that day, so mapping any number of dates to sessions is a single array lookup.
+    """
 
     @inject
     def __init__(self, config: Config):
         self.config = config
 
     def get_valid_trading_start_date(self, start_date):
-        start_date = pd.Timestamp(start_date, tz='UTC')
-
-        if self.trading_calendar.is_session(start_date):
-            return start_date.replace(tzinfo=None)
-        else:
-            return self.trading_calendar.next_open(start_date).normalize().replace(tzinfo=None)
+        return self.snap_to_sessions([start_date], direction='forward')[0]
 
     def get_valid_trading_end_date(self, end_date):
-        end_date = pd.Timestamp(end_date, tz='UTC')
-
-        if self.trading_calendar.is_session(end_date):
-            return end_date.replace(tzinfo=None)
-        else:
-            return self.trading_calendar.previous_open(end_date).normalize().replace(tzinfo=None)
+        return self.snap_to_sessions([end_date], direction='backward')[0]
 
     def get_n_trading_days_from(self, n, date):
-        if n == 0:
-            dates = []
+        if n < 0:
+            end = self.get_session_ordinals([date], side='left')[0]
+            start = max(end + n, 0)
         else:
-            dates = self.trading_calendar.sessions_window(date, n)
-            dates = [d.replace(tzinfo=None) for d in dates]
-
-            if n < 0:
-                dates = dates[:-1]
-            else:
-                dates = dates[1:]
+            start = self.get_session_ordinals([date], side='right')[0]
+            end = start + n
 
-        return dates
+        return list(self.sessions[start:end])
 
     def get_trading_days_between(self, start_date, end_date):
-        dates = self.trading_calendar.sessions_in_range(start_date, end_date)
-        dates = [d.replace(tzinfo=None) for d in dates]
+        return list(self.get_sessions_between(start_date, end_date))
+
+    def get_sessions(self):
+        return self.sessions
+
+    def get_sessions_between(self, start_date, end_date):
+        start = self.get_session_ordinals([start_date], side='left')[0]
+        end = self.get_session_ordinals([end_date], side='right')[0]
+
+        return self.sessions[start:end]
+
+    def get_session_ordinals(self, dates, side='left'):
+        days = self._days(dates)
+        ordinals = self.day_ordinals[np.clip(days, 0, len(self.day_ordinals) - 1)]
+
+        if side == 'right':
+            ordinals = ordinals + self.day_is_session[np.clip(days, 0, len(self.day_is_session) - 1)]
+
+        # Dates outside of the calendar map past its ends
+        ordinals[days < 0] = 0
+        ordinals[days >= len(self.day_ordinals)] = len(self.sessions)
+
+        return ordinals
+
+    def shift_sessions(self, dates, n):
+        if n < 0:
+            ordinals = self.get_session_ordinals(dates, side='left') + n
+        elif n > 0:
+            ordinals = self.get_session_ordinals(dates, side='right') + n - 1
+        else:
+            ordinals = self.get_session_ordinals(dates, side='left')
+
+        return self._sessions_at(ordinals)
 
-        return dates
+    def snap_to_sessions(self, dates, direction='forward'):
+        if direction == 'forward':
+            return self._sessions_at(self.get_session_ordinals(dates, side='left'))
+        elif direction == 'backward':
+            return self._sessions_at(self.get_session_ordinals(dates, side='right') - 1)
+        else:
+            raise ValueError("Unknown direction '{}'".format(direction))
 
     @property
     def trading_calendar(self):
         return self.config.trading_calendar
+
+    @memoized_property
+    def sessions(self):
+        return pd.DatetimeIndex(self.trading_calendar.all_sessions.values)
+
+    @memoized_property
+    def first_day(self):
+        return self.sessions.values[0].astype('datetime64[D]')
+
+    @memoized_property
+    def day_ordinals(self):
+        days = (self.sessions.values.astype('datetime64[D]') - self.first_day).astype(np.int64)
+
+        return np.searchsorted(days, np.arange(days[-1] + 1))
+
+    @memoized_property
+    def day_is_session(self):
+        days = (self.sessions.values.astype('datetime64[D]') - self.first_day).astype(np.int64)
+        is_session = np.zeros(days[-1] + 1, dtype=np.int64)
+        is_session[days] = 1
+
+        return is_session
+
+    def _days(self, dates):
+        dates = pd.DatetimeIndex(pd.to_datetime(dates))
+
+        if dates.tz is not None:
+            dates = dates.tz_localize(None)
+
+        return (dates.values.astype('datetime64[D]') - self.first_day).astype(np.int64)
+
+    def _sessions_at(self, ordinals):
+        valid = (ordinals >= 0) & (ordinals < len(self.sessions))
+        values = np.full(len(ordinals), np.datetime64('NaT'), dtype='datetime64[ns]')
+        values[valid] = self.sessions.values[ordinals[valid]]
+
+        return pd.DatetimeIndex(values)
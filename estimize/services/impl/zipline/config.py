@@ -2,7 +2,7 @@ from memoized_property import memoized_property
 from sqlalchemy import create_engine
 from zipline.assets import AssetDBWriter, AssetFinder
 from zipline.data.bundles import register
-from zipline.data.bundles.core import load
+from zipline.data.bundles.core import ingestions_for_bundle, load
 from zipline.pipeline import USEquityPricingLoader
 from zipline.pipeline.data import USEquityPricing
 from zipline.pipeline.engine import SimplePipelineEngine
@@ -52,6 +52,11 @@ class Config:
     def db_engine(self):
         return create_engine(self.bundle_data.asset_finder.engine.url)
 
+    @memoized_property
+    def ingest_timestamp(self):
+        # The most recent ingestion is the one load() reads
+        return ingestions_for_bundle(self.bundle_name)[0]
+
     @memoized_property
     def bundle_data(self):
         return load(self.bundle_name)
@@ -63,9 +68,12 @@ class YahooConfig(Config):
         'SPY',
     }
 
+    # Far above the sids of the quandl bundle, so assets of both bundles can share a frame
+    FIRST_SID = 1000000
+
     register(
         'yahoo',
-        yahoo_bundle(YAHOO_TICKERS),
+        yahoo_bundle(YAHOO_TICKERS, first_sid=FIRST_SID),
     )
 
     def __init__(self):
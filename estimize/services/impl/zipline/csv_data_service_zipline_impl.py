@@ -1,18 +1,25 @@
+import os
+import urllib.parse
+
 from injector import inject
-from pandas import read_csv
-from zipline.sources.requests_csv import PandasCSV, PandasRequestsCSV
+import numpy as np
+import pandas as pd
+from zipline.sources.requests_csv import PandasCSV
 
+import estimize.config as cfg
+from estimize import downloads
+from estimize.pandas import csvutils
 from estimize.services.csv_data_service import CsvDataService
+from estimize.services.symbol_service import SymbolService
 from estimize.services.impl.zipline import Config
 
 
 class CsvDataServiceZiplineImpl(CsvDataService):
 
-    MAX_DOCUMENT_SIZE = (1024 * 1024) * 1000  # 1Gb
-
     @inject
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, symbol_service: SymbolService):
         self.config = config
+        self.symbol_service = symbol_service
 
     def get_from_file(self,
                       filename,
@@ -27,9 +34,9 @@ class CsvDataServiceZiplineImpl(CsvDataService):
         pre_func = pre_func or False
         post_func = post_func or False
 
-        file = open(filename)
         csv = PandasFileCSV(
-            file=file,
+            filename=filename,
+            symbol_service=self.symbol_service,
             pre_func=pre_func,
             post_func=post_func,
             asset_finder=self.config.asset_finder,
@@ -58,35 +65,43 @@ class CsvDataServiceZiplineImpl(CsvDataService):
                      symbol_column='symbol',
                      **kwargs):
 
-        pre_func = pre_func or False
-        post_func = post_func or False
+        # Streamed to disk and parsed from there, the file is never held in memory as a whole
+        path = downloads.download(url, self._download_path(url))
 
-        PandasRequestsCSV.MAX_DOCUMENT_SIZE = self.MAX_DOCUMENT_SIZE
-        csv = PandasRequestsCSV(
-            url=url,
-            pre_func=pre_func,
-            post_func=post_func,
-            asset_finder=self.config.asset_finder,
-            trading_day=None,
-            start_date=None,
-            end_date=None,
-            date_column=date_column,
-            date_format=date_format,
-            timezone=timezone,
-            symbol=None,
-            mask=True,
-            symbol_column=symbol_column,
-            data_frequency=None,
-            **kwargs
-        )
+        try:
+            return self.get_from_file(
+                filename=path,
+                pre_func=pre_func,
+                post_func=post_func,
+                date_column=date_column,
+                date_format=date_format,
+                timezone=timezone,
+                symbol_column=symbol_column,
+                **kwargs
+            )
+        finally:
+            os.remove(path)
 
-        return csv.load_df()
+    @staticmethod
+    def _download_path(url):
+        directory = cfg.download_dir()
+        os.makedirs(directory, exist_ok=True)
+
+        return os.path.join(directory, os.path.basename(urllib.parse.urlparse(url).path))
 
 
 class PandasFileCSV(PandasCSV):
+    """Reads a local CSV file into the same frame as zipline's ``PandasCSV.load_df``, with whole array operations.
+
+    Dates repeat across many rows, so each distinct date string is parsed once. Symbols are joined against
+    the symbol table of ``symbol_service`` rather than looked up a row at a time. ``dtype`` and ``usecols``
+    are passed on to ``read_csv`` so files can be read with an explicit schema. Large files are parsed in
+    chunks by ``processes`` processes, which apply ``pre_func`` as well.
+    """
 
     def __init__(self,
-                 file,
+                 filename,
+                 symbol_service,
                  pre_func,
                  post_func,
                  asset_finder,
@@ -100,8 +115,11 @@ class PandasFileCSV(PandasCSV):
                  mask,
                  symbol_column,
                  data_frequency,
+                 processes=cfg.CSV_PARSE_PROCESSES,
                  **kwargs):
-        self.file = file
+        self.filename = filename
+        self.symbol_service = symbol_service
+        self.processes = processes
 
         super(PandasFileCSV, self).__init__(
             pre_func,
@@ -121,5 +139,31 @@ class PandasFileCSV(PandasCSV):
         )
 
     def fetch_data(self):
-        df = read_csv(self.file, **self.pandas_kwargs)
+        df = csvutils.read_csv(self.filename, processes=self.processes, **self.pandas_kwargs)
+        return df
+
+    def load_df(self):
+        if self.symbol is not None or self.symbol_service is None:
+            return super(PandasFileCSV, self).load_df()
+
+        df = csvutils.read_csv(self.filename, processes=self.processes, pre_func=self.pre_func, **self.pandas_kwargs)
+
+        # zipline ignores the date format too and lets pandas infer it
+        date_codes, date_values = pd.factorize(df[self.date_column].values)
+        dates = self.parse_date_str_series(None, self.timezone, pd.Series(date_values), self.data_frequency, self.trading_day)
+        dates = np.append(dates.values, np.datetime64('NaT'))[date_codes]
+        sids = self.symbol_service.map_symbols(df[self.symbol_column].values, dates)
+
+        keep = ~pd.isnull(dates) & ~pd.isnull(sids)
+        rows = np.flatnonzero(keep)
+        rows = rows[np.argsort(dates[rows], kind='mergesort')]
+
+        columns = [column for column in df.columns if column not in (self.date_column, self.symbol_column, 'sid')]
+        df = df[columns].take(rows)
+        df['sid'] = sids[rows]
+        df.index = pd.DatetimeIndex(dates[rows], name='dt').tz_localize('UTC')
+
+        if self.post_func:
+            df = self.post_func(df)
+
         return df
@@ -0,0 +1,136 @@
+import logging
+import threading
+
+from injector import inject
+from memoized_property import memoized_property
+import numpy as np
+import pandas as pd
+import pytz
+from zipline.errors import SymbolNotFound
+from zipline.assets.asset_writer import split_delimited_symbol
+
+from estimize.services import CacheService, SymbolService
+from estimize.services.impl.zipline import Config
+
+logger = logging.getLogger(__name__)
+
+
+class SymbolServiceZiplineImpl(SymbolService):
+    """Resolves ticker symbols to the assets of the bundle of ``config`` a whole column at a time.
+
+    The symbol ownership periods of the bundle are read once per ingestion into a table, cached, and symbols
+    are joined against it. A symbol held by a single asset resolves to it whatever the date, one held by
+    several resolves to the asset holding it on the date, the same as ``AssetFinder.lookup_symbol``.
+    """
+
+    KEY_SEPARATOR = '.'
+
+    @inject
+    def __init__(self, config: Config, cache_service: CacheService):
+        self.config = config
+        self.cache_service = cache_service
+        self.lock = threading.Lock()
+
+    def get_symbols(self) -> pd.DataFrame:
+        with self.lock:
+            return self.symbols
+
+    def map_symbols(self, symbols, dates=None) -> np.ndarray:
+        """Assets of ``symbols`` held on ``dates`` (UTC), NaN where a symbol doesn't resolve"""
+        table = self.get_symbols()
+        codes, uniques = pd.factorize(np.asarray(symbols, dtype=object))
+        keys = [self._key(symbol) for symbol in uniques]
+
+        # Symbols are joined on their first period, the ones held by several assets are resolved by date below
+        first = table.drop_duplicates('key')
+        positions = pd.Index(first['key'].values).get_indexer(keys)
+        # Position -1 of symbols missing from the table picks the appended values
+        conflicted = np.append(first['owners'].values, 0)[positions] > 1
+        unique_sids = np.where(conflicted, -1, np.append(first['sid'].values, -1)[positions])
+        sids = np.append(unique_sids, -1)[codes]
+
+        if dates is not None and conflicted.any():
+            dates = pd.DatetimeIndex(dates).values.astype('datetime64[ns]')
+            rows = np.flatnonzero(np.append(conflicted, False)[codes] & ~pd.isnull(dates))
+            sids[rows] = self._resolve_on(table, uniques, keys, codes[rows], dates[rows])
+
+        return self._assets(sids)
+
+    @memoized_property
+    def symbols(self):
+        cache_key = self.cache_service.versioned_key(
+            'symbols_{}'.format(self.config.bundle_name),
+            self.config.ingest_timestamp,
+            self._build_symbols
+        )
+        df = self.cache_service.get(cache_key)
+
+        if df is None:
+            df = self._build_symbols(self.config.asset_finder)
+            self.cache_service.put(cache_key, df)
+
+        return df
+
+    @classmethod
+    def _build_symbols(cls, asset_finder):
+        """One row per ownership period of every symbol, sorted by symbol and start date.
+
+        ``owners`` counts the periods of the symbol, the first row of every symbol is the one joined on.
+        """
+        rows = [
+            (cls.KEY_SEPARATOR.join(key), owner.sid, owner.start.value, owner.end.value, len(owners))
+            for key, owners in asset_finder.symbol_ownership_map.items()
+            for owner in owners
+        ]
+        df = pd.DataFrame.from_records(rows, columns=['key', 'sid', 'start_date', 'end_date', 'owners'])
+        df.sort_values(['key', 'start_date'], inplace=True)
+        df.reset_index(drop=True, inplace=True)
+
+        logger.info('Built the symbol table of {} symbols'.format(df['key'].nunique()))
+
+        return df
+
+    def _resolve_on(self, table, uniques, keys, codes, dates):
+        """Sids of symbols held by several assets on ``dates``, resolved once per distinct symbol and date"""
+        pairs = pd.DataFrame({'code': codes, 'date': dates.view(np.int64)})
+        distinct = pairs.drop_duplicates()
+
+        symbols = pd.DataFrame({'code': distinct['code'].unique()})
+        symbols['key'] = [keys[code] for code in symbols['code'].values]
+        periods = symbols.merge(table[['key', 'sid', 'start_date', 'end_date']], on='key')
+
+        df = distinct.merge(periods, on='code')
+        df = df.iloc[((df['start_date'] <= df['date']) & (df['date'] < df['end_date'])).values]
+        resolved = distinct.merge(df[['code', 'date', 'sid']], on=['code', 'date'], how='left')
+        sids = resolved['sid'].fillna(-1).values.astype(np.int64)
+
+        # zipline decides what a date outside of every period resolves to
+        for i in np.flatnonzero(sids < 0):
+            sids[i] = self._lookup_symbol_on(uniques[resolved['code'].values[i]], resolved['date'].values[i])
+
+        resolved['sid'] = sids
+
+        return pairs.merge(resolved, on=['code', 'date'], how='left')['sid'].values
+
+    def _lookup_symbol_on(self, symbol, date):
+        try:
+            asset = self.config.asset_finder.lookup_symbol(symbol, pd.Timestamp(date).replace(tzinfo=pytz.utc))
+            return asset.sid if asset else -1
+        except SymbolNotFound:
+            return -1
+
+    def _assets(self, sids):
+        """Assets of ``sids``, each distinct asset is retrieved once"""
+        codes, uniques = pd.factorize(sids)
+        assets = np.full(len(uniques), np.nan, dtype=object)
+        found = np.flatnonzero(uniques >= 0)
+        assets[found] = self.config.asset_finder.retrieve_all(uniques[found].tolist())
+
+        return assets[codes]
+
+    @classmethod
+    def _key(cls, symbol):
+        try:
+            return cls.KEY_SEPARATOR.join(split_delimited_symbol(symbol))
+        except (AttributeError, TypeError):
+            return None
@@ -1,7 +1,12 @@
+import datetime
 from unittest import TestCase
 
 from injector import Injector
 import pandas as pd
+from zipline.pipeline import Pipeline
+from zipline.pipeline.factors import SimpleMovingAverage
+from zipline.pipeline.data import USEquityPricing
+from zipline.pipeline.filters import StaticAssets
 
 import estimize.config as cfg
 from estimize.di.default_module import DefaultModule
@@ -25,3 +30,71 @@ class TestAssetServiceZiplineImpl(TestCase):
         self.assertEqual(df.index.get_level_values('as_of_date')[-1], pd.Timestamp('2017-12-27'))
 
         print(df)
+
+    def test_get_returns_dates_are_sessions(self):
+        asset = self.service.get_asset('AAPL')
+        df = self.service.get_returns('2017-01-01', '2017-02-01', [asset])
+        dates = df.index.get_level_values('as_of_date')
+
+        self.assertEqual(dates[0], datetime.date(2017, 1, 3))
+        self.assertTrue(dates.is_monotonic_increasing)
+
+    def test_get_returns_compact_dates(self):
+        compact_index = cfg.COMPACT_INDEX
+        cfg.COMPACT_INDEX = True
+
+        try:
+            asset = self.service.get_asset('AAPL')
+            df = self.service.get_returns('2017-01-01', '2017-02-01', [asset])
+            dates = df.index.get_level_values('as_of_date')
+
+            self.assertEqual(dates.dtype, 'datetime64[ns]')
+            self.assertEqual(dates[0], pd.Timestamp('2017-01-03'))
+        finally:
+            cfg.COMPACT_INDEX = compact_index
+
+    def test_get_returns_served_from_cached_superset(self):
+        aapl, msft = self.service.get_assets(['AAPL', 'MSFT'])
+        df = self.service.get_returns('2017-01-01', '2017-06-30', [aapl, msft])
+        sub_df = self.service.get_returns('2017-02-01', '2017-03-31', [msft])
+
+        expected = df.iloc[df.index.get_level_values('asset') == msft]
+        dates = expected.index.get_level_values('as_of_date')
+        # The last session of a range has no next open, so its row is dropped
+        expected = expected.iloc[(dates >= datetime.date(2017, 2, 1)) & (dates < datetime.date(2017, 3, 30))]
+
+        pd.util.testing.assert_frame_equal(sub_df, expected)
+
+    def test_pipelines_of_different_terms_are_cached_side_by_side(self):
+        asset_service = self.service.asset_service
+        aapl = self.service.get_asset('AAPL')
+
+        asset_service.get_moving_average('2017-01-01', '2017-02-01', [aapl], window_length=20)
+        asset_service.get_moving_average('2017-01-01', '2017-02-01', [aapl], window_length=63)
+
+        names = [key.split('@')[0] for key in asset_service.cache_service.local_cache.keys()]
+        self.assertIn('pipeline_quantopian-quandl_moving_average_20', names)
+        self.assertIn('pipeline_quantopian-quandl_moving_average_63', names)
+
+    def test_get_returns_across_bundles(self):
+        aapl, spy = self.service.get_assets(['AAPL', 'SPY'])
+        df = self.service.get_returns('2017-01-01', '2017-02-01', [aapl, spy])
+
+        pd.util.testing.assert_frame_equal(
+            df.iloc[df.index.get_level_values('asset') == spy],
+            self.service.get_returns('2017-01-01', '2017-02-01', [spy])
+        )
+        self.assertEqual(set(df.index.get_level_values('asset')), {aapl, spy})
+
+    def test_run_pipeline_in_chunks(self):
+        asset_service = self.service.asset_service
+        pipeline = Pipeline(
+            columns={'moving_average': SimpleMovingAverage(inputs=[USEquityPricing.close], window_length=20)},
+            screen=StaticAssets(self.service.get_assets(['AAPL', 'MSFT']))
+        )
+
+        df = asset_service._run_pipeline(pipeline, '2017-01-01', '2017-03-31', chunk_sessions=1000)
+
+        pd.util.testing.assert_frame_equal(
+            asset_service._run_pipeline(pipeline, '2017-01-01', '2017-03-31', chunk_sessions=7), df
+        )
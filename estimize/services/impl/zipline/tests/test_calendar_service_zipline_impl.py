@@ -31,6 +31,24 @@ class CalendarServiceZiplineImpl(unittest.TestCase):
         self.assertEqual(len(days), 1)
         self.assertEqual(days[0], pd.Timestamp('2016-12-30').replace(tzinfo=None))
 
+    def test_shift_sessions(self):
+        dates = ['2017-01-03', '2017-01-01', '2016-12-30']
+
+        self.assertEqual(self.service.shift_sessions(dates, -1).tolist(), pd.to_datetime(['2016-12-30', '2016-12-30', '2016-12-29']).tolist())
+        self.assertEqual(self.service.shift_sessions(dates, 1).tolist(), pd.to_datetime(['2017-01-04', '2017-01-03', '2017-01-03']).tolist())
+
+    def test_snap_to_sessions(self):
+        dates = ['2017-01-01', '2017-01-03']
+
+        self.assertEqual(self.service.snap_to_sessions(dates, 'forward').tolist(), pd.to_datetime(['2017-01-03', '2017-01-03']).tolist())
+        self.assertEqual(self.service.snap_to_sessions(dates, 'backward').tolist(), pd.to_datetime(['2016-12-30', '2017-01-03']).tolist())
+
+    def test_scalar_methods_match_vectorized(self):
+        self.assertEqual(self.service.get_valid_trading_start_date('2017-01-01'), pd.Timestamp('2017-01-03'))
+        self.assertEqual(self.service.get_valid_trading_end_date('2017-01-01'), pd.Timestamp('2016-12-30'))
+        self.assertEqual(self.service.get_n_trading_days_from(2, '2016-12-29'), pd.to_datetime(['2016-12-30', '2017-01-03']).tolist())
+        self.assertEqual(len(self.service.get_sessions_between('2017-01-03', '2018-01-02')), 252)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,71 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from injector import Injector
+import pandas as pd
+
+from estimize.di.default_module import DefaultModule
+from estimize.services import CsvDataService
+from estimize.services.impl.tests.http_server import StaticHTTPServer
+
+
+class TestCsvDataServiceZiplineImpl(TestCase):
+
+    def setUp(self):
+        injector = Injector([DefaultModule])
+        self.service = injector.get(CsvDataService)
+
+        fd, self.filename = tempfile.mkstemp(suffix='.csv')
+
+        with os.fdopen(fd, 'w') as f:
+            f.write('date,ticker,cusip,value\n')
+            f.write('2017-01-04,MSFT,594918104,1.5\n')
+            f.write('2017-01-03,AAPL,037833100,2.5\n')
+            f.write('2017-01-03,NOT_A_TICKER,000000000,3.5\n')
+            f.write('not a date,AAPL,037833100,4.5\n')
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def test_get_from_file(self):
+        df = self.service.get_from_file(
+            filename=self.filename,
+            date_column='date',
+            timezone='US/Eastern',
+            symbol_column='ticker',
+            usecols=['date', 'ticker', 'value'],
+            dtype={'value': 'float32'}
+        )
+
+        self.assertEqual(list(df.columns), ['value', 'sid'])
+        self.assertEqual(str(df.index.tz), 'UTC')
+        self.assertEqual(list(df.index), [pd.Timestamp('2017-01-03 05:00', tz='UTC'), pd.Timestamp('2017-01-04 05:00', tz='UTC')])
+        self.assertEqual([asset.symbol for asset in df['sid']], ['AAPL', 'MSFT'])
+        self.assertEqual(df['value'].dtype, 'float32')
+
+    def test_get_from_url(self):
+        with open(self.filename, 'rb') as f:
+            server = StaticHTTPServer({'/data.csv': f.read()}).start()
+
+        server.truncate['/data.csv'] = 40
+
+        try:
+            df = self.service.get_from_url(
+                url='{}/data.csv'.format(server.url),
+                date_column='date',
+                timezone='US/Eastern',
+                symbol_column='ticker'
+            )
+        finally:
+            server.stop()
+
+        expected = self.service.get_from_file(
+            filename=self.filename,
+            date_column='date',
+            timezone='US/Eastern',
+            symbol_column='ticker'
+        )
+
+        pd.util.testing.assert_frame_equal(df, expected)
+        self.assertEqual(server.requests[-1], ('GET', '/data.csv', 'bytes=40-'))
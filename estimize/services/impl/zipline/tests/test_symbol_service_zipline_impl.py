@@ -0,0 +1,39 @@
+import unittest
+
+from injector import Injector
+import numpy as np
+import pandas as pd
+
+from estimize.di.default_module import DefaultModule
+from estimize.services import AssetService, SymbolService
+
+
+class TestSymbolServiceZiplineImpl(unittest.TestCase):
+
+    def setUp(self):
+        injector = Injector([DefaultModule])
+        self.asset_service = injector.get(AssetService)
+        self.service = injector.get(SymbolService)
+
+    def test_get_symbols(self):
+        df = self.service.get_symbols()
+
+        self.assertEqual(list(df.columns), ['key', 'sid', 'start_date', 'end_date', 'owners'])
+        self.assertTrue((df['start_date'] < df['end_date']).all())
+
+    def test_map_symbols(self):
+        symbols = ['AAPL', 'msft', 'NOT_A_TICKER', np.nan, 'AAPL']
+        dates = pd.to_datetime(['2017-01-03'] * len(symbols))
+
+        assets = self.service.map_symbols(symbols, dates)
+
+        aapl, msft = self.asset_service.get_assets(['AAPL', 'MSFT'])
+        self.assertEqual(assets[0], aapl)
+        self.assertEqual(assets[1], msft)
+        self.assertTrue(pd.isnull(assets[2]))
+        self.assertTrue(pd.isnull(assets[3]))
+        self.assertIs(assets[4], assets[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
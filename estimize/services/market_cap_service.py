@@ -3,6 +3,11 @@ from abc import abstractmethod
 
 class MarketCapService:
 
+    @property
+    @abstractmethod
+    def cache_key(self) -> str:
+        raise NotImplementedError()
+
     @abstractmethod
     def get_market_caps(self, start_date=None, end_date=None, assets=None):
         raise NotImplementedError()
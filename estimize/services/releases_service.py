@@ -1,7 +1,14 @@
+from abc import abstractmethod
+
 import pandas as pd
 
 
 class ReleasesService:
 
+    @property
+    @abstractmethod
+    def cache_key(self) -> str:
+        raise NotImplementedError()
+
     def get_releases(self, start_date=None, end_date=None, assets=None) -> pd.DataFrame:
         raise NotImplementedError()
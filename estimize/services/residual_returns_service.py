@@ -0,0 +1,19 @@
+from abc import abstractmethod
+
+import pandas as pd
+
+
+class ResidualReturnsService:
+
+    @property
+    @abstractmethod
+    def cache_key(self) -> str:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def get_market_neutral_residual_returns(self, start_date=None, end_date=None, assets=None, on='open') -> pd.DataFrame:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def get_returns_panel(self, on='open'):
+        raise NotImplementedError()
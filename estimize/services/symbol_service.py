@@ -0,0 +1,14 @@
+from abc import abstractmethod
+import numpy as np
+import pandas as pd
+
+
+class SymbolService:
+
+    @abstractmethod
+    def get_symbols(self) -> pd.DataFrame:
+        raise NotImplementedError()
+
+    @abstractmethod
+    def map_symbols(self, symbols, dates=None) -> np.ndarray:
+        raise NotImplementedError()
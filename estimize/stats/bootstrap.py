@@ -0,0 +1,61 @@
+import multiprocessing as mp
+
+import numpy as np
+import pathos.pools as pp
+
+# Upper bound on the number of values drawn at once, draws are batched to stay below it
+BATCH_ELEMENTS = 2 ** 22
+
+
+def bootstrap_mean_intervals(samples, draws=1000, confidence=0.95, seed=0, processes=None):
+    """Percentile bootstrap confidence intervals of the column means of each ``observations x columns`` matrix.
+
+    Every draw resamples the rows of a matrix with replacement. Draws are generated in batches of index
+    arrays, each batch seeded from ``seed`` and its position alone, so the result doesn't depend on how the
+    batches are spread over the ``processes`` (default one per CPU, 1 to run in process).
+    Returns a ``(lower, upper)`` pair of arrays for each matrix.
+    """
+    tasks = []
+
+    for i, values in enumerate(samples):
+        values = np.asarray(values, dtype=np.float64)
+        batch_size = max(1, BATCH_ELEMENTS // max(values.size, 1))
+
+        for batch, start in enumerate(range(0, draws, batch_size)):
+            tasks.append((i, values, min(batch_size, draws - start), (seed, i, batch)))
+
+    processes = mp.cpu_count() if processes is None else processes
+
+    if processes > 1 and len(tasks) > 1:
+        pool = pp.ProcessPool(processes)
+
+        try:
+            means = pool.map(_bootstrap_batch, tasks)
+        finally:
+            pool.close()
+            pool.join()
+            pool.clear()
+    else:
+        means = [_bootstrap_batch(task) for task in tasks]
+
+    tail = 100 * (1 - confidence) / 2
+    intervals = []
+
+    for i in range(len(samples)):
+        sample_means = np.concatenate([m for task, m in zip(tasks, means) if task[0] == i])
+        lower, upper = np.percentile(sample_means, [tail, 100 - tail], axis=0)
+        intervals.append((lower, upper))
+
+    return intervals
+
+
+def _bootstrap_batch(task):
+    _, values, draws, seed = task
+
+    if len(values) == 0:
+        return np.full((draws,) + values.shape[1:], np.nan)
+
+    random = np.random.RandomState(list(seed))
+    index = random.randint(0, len(values), size=(draws, len(values)))
+
+    return values[index].mean(axis=1)
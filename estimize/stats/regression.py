@@ -0,0 +1,138 @@
+from collections import namedtuple
+
+import numpy as np
+from scipy import stats
+
+MarketModel = namedtuple(
+    'MarketModel', ['alpha', 'beta', 'alpha_std_error', 'beta_std_error', 'p_value', 'observations']
+)
+
+PANEL_BLOCK_SIZE = 256
+
+
+def rolling_market_model(returns, market_returns, window_length) -> MarketModel:
+    """Fits ``returns = alpha + beta * market_returns`` over every trailing window of ``window_length`` observations.
+
+    The estimates match running statsmodels' OLS with a constant on each window, but all windows are solved
+    at once from rolling sums of the (centred) observations. Every array in the result is aligned with the
+    inputs; rows before the first full window are NaN. ``p_value`` is the two-sided p-value of ``beta``.
+    """
+    model = rolling_market_model_panel(
+        np.asarray(returns, dtype=np.float64)[:, np.newaxis],
+        market_returns,
+        window_length
+    )
+
+    return MarketModel(*(values[:, 0] for values in model))
+
+
+def rolling_market_model_panel(returns, market_returns, window_length, min_observations=None) -> MarketModel:
+    """Fits the market model for every column of a ``dates x assets`` return matrix against one market vector.
+
+    By default each column is fitted over its last ``window_length`` valid observations, the same as fitting it
+    alone with its missing returns dropped, and estimates are made on the rows of valid observations only.
+    ``observations`` holds the size of each window, 0 on rows without a valid observation.
+
+    With ``min_observations`` windows span ``window_length`` rows instead and skip NaN returns, so each column
+    is fitted on however many observations it has in the window. Estimates are NaN wherever a window holds
+    fewer than ``min_observations``, so a gap blanks the estimates of the rows whose windows it falls in.
+
+    Columns are solved in blocks to bound the size of the intermediate arrays.
+    """
+    y = np.asarray(returns, dtype=np.float64)
+    x = np.asarray(market_returns, dtype=np.float64)
+
+    if min_observations is None:
+        return _fit_valid_observations(y, x, window_length)
+
+    return _fit_rows(y, x[:, np.newaxis], window_length, max(min_observations, 3))
+
+
+def _fit_valid_observations(y, x, window_length):
+    valid = ~np.isnan(y) & ~np.isnan(x)[:, np.newaxis]
+    columns = np.arange(y.shape[1])
+
+    # Moves the valid observations of every column to the top in order, so windows of rows are windows of observations
+    order = np.argsort(~valid, axis=0, kind='mergesort')
+    packed = _fit_rows(y[order, columns], x[order], window_length, window_length)
+    results = []
+
+    for packed_values in packed:
+        values = np.empty(y.shape)
+        values[order, columns] = packed_values
+        results.append(values)
+
+    results[-1][~valid] = 0
+
+    return MarketModel(*results)
+
+
+def _fit_rows(y, x, window_length, min_observations):
+    """Fits every column of ``y`` against the same column of ``x``, or its only column"""
+    results = [np.full(y.shape, np.nan) for _ in MarketModel._fields]
+    results[-1] = np.zeros(y.shape)
+
+    if len(y) < window_length:
+        return MarketModel(*results)
+
+    for start in range(0, y.shape[1], PANEL_BLOCK_SIZE):
+        columns = slice(start, start + PANEL_BLOCK_SIZE)
+        block = _fit_block(y[:, columns], x if x.shape[1] == 1 else x[:, columns], window_length, min_observations)
+
+        for values, block_values in zip(results, block):
+            values[window_length - 1:, columns] = block_values
+
+    return MarketModel(*results)
+
+
+def _fit_block(y, x, window_length, min_observations):
+    valid = ~np.isnan(y) & ~np.isnan(x)
+    observations = _rolling_sum(valid.astype(np.float64), window_length)
+
+    # Centring first keeps the rolling sums of squares well conditioned
+    with np.errstate(invalid='ignore'):
+        x_offset = np.nanmean(np.where(valid, x, np.nan), axis=0)
+        y_offset = np.nanmean(np.where(valid, y, np.nan), axis=0)
+
+    x_offset = np.where(np.isnan(x_offset), 0.0, x_offset)
+    y_offset = np.where(np.isnan(y_offset), 0.0, y_offset)
+    xc = np.where(valid, x - x_offset, 0.0)
+    yc = np.where(valid, y - y_offset, 0.0)
+
+    sum_x = _rolling_sum(xc, window_length)
+    sum_y = _rolling_sum(yc, window_length)
+    sum_xx = _rolling_sum(xc * xc, window_length)
+    sum_xy = _rolling_sum(xc * yc, window_length)
+    sum_yy = _rolling_sum(yc * yc, window_length)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_x = sum_x / observations
+        mean_y = sum_y / observations
+        sxx = sum_xx - sum_x * mean_x
+        sxy = sum_xy - sum_x * mean_y
+        syy = sum_yy - sum_y * mean_y
+
+        beta = sxy / sxx
+        alpha = (mean_y + y_offset) - beta * (mean_x + x_offset)
+
+        df_resid = observations - 2
+        sigma2 = np.maximum(syy - beta * sxy, 0.0) / df_resid
+
+        beta_std_error = np.sqrt(sigma2 / sxx)
+        alpha_std_error = np.sqrt(sigma2 * (1.0 / observations + (mean_x + x_offset) ** 2 / sxx))
+        t_value = beta / beta_std_error
+        p_value = 2 * stats.t.sf(np.abs(t_value), np.maximum(df_resid, 1))
+
+    insufficient = observations < min_observations
+
+    for values in (alpha, beta, alpha_std_error, beta_std_error, p_value):
+        values[insufficient] = np.nan
+
+    return alpha, beta, alpha_std_error, beta_std_error, p_value, observations
+
+
+def _rolling_sum(values, window_length):
+    totals = np.cumsum(values, axis=0)
+    totals = np.concatenate((np.zeros((1,) + totals.shape[1:]), totals))
+
+    return totals[window_length:] - totals[:-window_length]
@@ -0,0 +1,45 @@
+import unittest
+
+import numpy as np
+
+from estimize.stats import bootstrap
+from estimize.stats.bootstrap import bootstrap_mean_intervals
+
+
+class TestBootstrapMeanIntervals(unittest.TestCase):
+
+    def setUp(self):
+        random = np.random.RandomState(42)
+        self.samples = [random.normal(0.01, 0.02, (400, 3)), random.normal(0.0, 0.05, (50, 3))]
+
+    def test_intervals_cover_the_mean(self):
+        intervals = bootstrap_mean_intervals(self.samples, draws=500, processes=1)
+
+        for values, (lower, upper) in zip(self.samples, intervals):
+            mean = values.mean(axis=0)
+            std_error = values.std(axis=0, ddof=1) / np.sqrt(len(values))
+
+            self.assertTrue((lower < mean).all() and (mean < upper).all())
+            np.testing.assert_allclose(upper - lower, 2 * 1.96 * std_error, rtol=0.2)
+
+    def test_reproducible_across_processes(self):
+        expected = bootstrap_mean_intervals(self.samples, draws=300, seed=7, processes=1)
+
+        batch_elements = bootstrap.BATCH_ELEMENTS
+        bootstrap.BATCH_ELEMENTS = 20000
+
+        try:
+            in_process = bootstrap_mean_intervals(self.samples, draws=300, seed=7, processes=1)
+            pooled = bootstrap_mean_intervals(self.samples, draws=300, seed=7, processes=2)
+        finally:
+            bootstrap.BATCH_ELEMENTS = batch_elements
+
+        np.testing.assert_array_equal(np.array(pooled), np.array(in_process))
+        self.assertFalse(np.array_equal(np.array(in_process), np.array(
+            bootstrap_mean_intervals(self.samples, draws=300, seed=8, processes=1)
+        )))
+        np.testing.assert_allclose(np.array(in_process), np.array(expected), atol=0.01)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+
+import numpy as np
+import statsmodels.api as sm
+
+from estimize.stats.regression import rolling_market_model, rolling_market_model_panel
+
+
+class TestRollingMarketModel(unittest.TestCase):
+
+    def setUp(self):
+        random = np.random.RandomState(42)
+        self.window_length = 126
+        self.market_returns = random.normal(0.0005, 0.01, 400)
+        self.returns = 0.0002 + 1.3 * self.market_returns + random.normal(0.0, 0.02, 400)
+        # A stretch with no relationship to the market exercises the insignificant case
+        self.returns[250:] = random.normal(0.0, 0.02, 150)
+
+    def test_matches_statsmodels(self):
+        model = rolling_market_model(self.returns, self.market_returns, self.window_length)
+
+        self.assertTrue(np.isnan(model.beta[:self.window_length - 1]).all())
+
+        for i in range(self.window_length, len(self.returns) + 1):
+            y = self.returns[i - self.window_length:i]
+            x = sm.add_constant(self.market_returns[i - self.window_length:i])
+            fit = sm.OLS(y, x).fit()
+
+            self.assertAlmostEqual(model.alpha[i - 1], fit.params[0], 12)
+            self.assertAlmostEqual(model.beta[i - 1], fit.params[1], 10)
+            self.assertAlmostEqual(model.alpha_std_error[i - 1], fit.bse[0], 12)
+            self.assertAlmostEqual(model.beta_std_error[i - 1], fit.bse[1], 10)
+            self.assertAlmostEqual(model.p_value[i - 1], fit.pvalues[1], 10)
+            self.assertEqual(model.p_value[i - 1] <= 0.05, fit.pvalues[1] <= 0.05)
+
+    def test_not_enough_observations(self):
+        model = rolling_market_model(self.returns[:10], self.market_returns[:10], self.window_length)
+
+        self.assertTrue(np.isnan(model.alpha).all())
+
+    def test_panel_matches_per_asset_fit(self):
+        listed = self.returns.copy()
+        listed[:50] = np.nan
+        delisted = self.returns.copy()
+        delisted[-30:] = np.nan
+        panel = np.column_stack([self.returns, listed, delisted])
+
+        model = rolling_market_model_panel(panel, self.market_returns, self.window_length)
+
+        for column, (start, end) in enumerate([(0, 400), (50, 400), (0, 370)]):
+            expected = rolling_market_model(self.returns[start:end], self.market_returns[start:end], self.window_length)
+
+            np.testing.assert_allclose(model.alpha[start:end, column], expected.alpha, rtol=1e-9, atol=1e-14)
+            np.testing.assert_allclose(model.beta[start:end, column], expected.beta, rtol=1e-9)
+            np.testing.assert_allclose(model.p_value[start:end, column], expected.p_value, rtol=1e-7, atol=1e-14)
+            self.assertTrue(np.isnan(model.beta[:start, column]).all())
+
+        self.assertEqual(model.observations[-1, 2], 0)
+        self.assertTrue(np.isnan(model.beta[-30:, 2]).all())
+
+    def test_panel_with_gaps_matches_per_asset_fit(self):
+        halted = self.returns.copy()
+        halted[[140, 141, 142, 300]] = np.nan
+        market_returns = self.market_returns.copy()
+        market_returns[200] = np.nan
+        panel = np.column_stack([halted, self.returns])
+
+        model = rolling_market_model_panel(panel, market_returns, self.window_length)
+
+        for column in range(panel.shape[1]):
+            valid = np.flatnonzero(~np.isnan(panel[:, column]) & ~np.isnan(market_returns))
+            expected = rolling_market_model(panel[valid, column], market_returns[valid], self.window_length)
+
+            np.testing.assert_allclose(model.alpha[valid, column], expected.alpha, rtol=1e-9, atol=1e-14)
+            np.testing.assert_allclose(model.beta[valid, column], expected.beta, rtol=1e-9)
+            np.testing.assert_allclose(model.p_value[valid, column], expected.p_value, rtol=1e-7, atol=1e-14)
+
+        # A halt only leaves its own rows without estimates
+        self.assertTrue(np.isnan(model.beta[[140, 141, 142, 200, 300], 0]).all())
+        self.assertFalse(np.isnan(model.beta[143:200, 0]).any())
+        self.assertEqual(model.observations[143, 0], self.window_length)
+
+    def test_panel_with_min_observations_counts_rows(self):
+        halted = self.returns.copy()
+        halted[140] = np.nan
+
+        panel = halted[:, np.newaxis]
+        model = rolling_market_model_panel(panel, self.market_returns, self.window_length, 100)
+        strict = rolling_market_model_panel(panel, self.market_returns, self.window_length, self.window_length)
+
+        self.assertEqual(model.observations[200, 0], self.window_length - 1)
+        self.assertFalse(np.isnan(model.beta[200, 0]))
+        self.assertTrue(np.isnan(strict.beta[141:140 + self.window_length, 0]).all())
+        self.assertFalse(np.isnan(strict.beta[140 + self.window_length, 0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
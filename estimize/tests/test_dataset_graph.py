@@ -0,0 +1,94 @@
+import threading
+import unittest
+
+from estimize.dataset_graph import DatasetGraph
+
+
+class FakeCacheService:
+
+    def __init__(self, keys):
+        self.keys = set(keys)
+
+    def exists(self, key):
+        return key in self.keys
+
+
+class TestDatasetGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.built = []
+        self.lock = threading.Lock()
+
+    def builder(self, name, error=None):
+        def build():
+            with self.lock:
+                self.built.append(name)
+
+            if error is not None:
+                raise error
+
+        return build
+
+    def test_inputs_are_built_first(self):
+        graph = DatasetGraph()
+        graph.add('asset_info', self.builder('asset_info'))
+        graph.add('estimize_consensuses', self.builder('estimize_consensuses'))
+        graph.add('estimize_final_consensuses', self.builder('estimize_final_consensuses'), inputs=['estimize_consensuses'])
+        graph.add('releases', self.builder('releases'), inputs=['asset_info'])
+
+        results = graph.build()
+
+        self.assertEqual(set(results), {'asset_info', 'estimize_consensuses', 'estimize_final_consensuses', 'releases'})
+        self.assertTrue(all(error is None for error in results.values()))
+        self.assertLess(self.built.index('asset_info'), self.built.index('releases'))
+        self.assertLess(self.built.index('estimize_consensuses'), self.built.index('estimize_final_consensuses'))
+
+    def test_independent_datasets_run_in_parallel(self):
+        barrier = threading.Barrier(2, timeout=5)
+        graph = DatasetGraph(max_workers=2)
+        graph.add('a', barrier.wait)
+        graph.add('b', barrier.wait)
+
+        results = graph.build()
+
+        self.assertEqual(results, {'a': None, 'b': None})
+
+    def test_cached_datasets_are_skipped(self):
+        graph = DatasetGraph(FakeCacheService(['asset_info@1']))
+        graph.add('asset_info', self.builder('asset_info'), key=lambda: 'asset_info@1')
+        graph.add('releases', self.builder('releases'), inputs=['asset_info'], key=lambda: 'releases@2')
+
+        graph.build()
+
+        self.assertEqual(self.built, ['releases'])
+
+    def test_failed_inputs(self):
+        graph = DatasetGraph()
+        graph.add('asset_info', self.builder('asset_info', ValueError('missing instruments.csv')))
+        graph.add('releases', self.builder('releases'), inputs=['asset_info'])
+        graph.add('estimates', self.builder('estimates'))
+
+        results = graph.build()
+
+        self.assertIsInstance(results['asset_info'], ValueError)
+        self.assertIsInstance(results['releases'], RuntimeError)
+        self.assertIsNone(results['estimates'])
+        self.assertNotIn('releases', self.built)
+
+    def test_subgraph(self):
+        graph = DatasetGraph()
+        graph.add('asset_info', self.builder('asset_info'))
+        graph.add('estimates', self.builder('estimates'))
+        graph.add('releases', self.builder('releases'), inputs=['asset_info'])
+
+        graph.build(['releases'])
+
+        self.assertEqual(self.built, ['asset_info', 'releases'])
+
+    def test_unknown_input(self):
+        with self.assertRaises(ValueError):
+            DatasetGraph().add('releases', self.builder('releases'), inputs=['asset_info'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from estimize import downloads
+from estimize.services.impl.tests.http_server import StaticHTTPServer
+
+
+class TestDownloads(unittest.TestCase):
+
+    CONTENT = b''.join('2017-01-03,AAPL,{}\n'.format(i).encode() for i in range(10000))
+
+    def setUp(self):
+        self.server = StaticHTTPServer({'/data.csv': self.CONTENT}).start()
+        self.url = '{}/data.csv'.format(self.server.url)
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'data.csv')
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.dir)
+
+    def test_download(self):
+        downloads.download(self.url, self.path, chunk_bytes=4096)
+
+        self.assertEqual(self.read(self.path), self.CONTENT)
+        self.assertEqual(os.listdir(self.dir), ['data.csv'])
+        self.assertEqual(self.server.requests, [('GET', '/data.csv', None)])
+
+    def test_download_resumes_where_the_connection_dropped(self):
+        self.server.truncate['/data.csv'] = 50000
+
+        downloads.download(self.url, self.path, chunk_bytes=4096)
+
+        self.assertEqual(self.read(self.path), self.CONTENT)
+        self.assertEqual(self.server.requests, [('GET', '/data.csv', None), ('GET', '/data.csv', 'bytes=50000-')])
+
+    def test_download_resumes_an_interrupted_process(self):
+        self.server.truncate['/data.csv'] = 50000
+
+        with self.assertRaises(downloads.DownloadError):
+            downloads.download(self.url, self.path, retries=0)
+
+        self.assertEqual(os.path.getsize('{}.part'.format(self.path)), 50000)
+        downloads.download(self.url, self.path)
+
+        self.assertEqual(self.read(self.path), self.CONTENT)
+        self.assertEqual(self.server.requests[-1], ('GET', '/data.csv', 'bytes=50000-'))
+
+    def test_download_restarts_when_the_file_changed(self):
+        self.server.truncate['/data.csv'] = 50000
+
+        with self.assertRaises(downloads.DownloadError):
+            downloads.download(self.url, self.path, retries=0)
+
+        content = self.CONTENT.replace(b'AAPL', b'MSFT')
+        self.server.files['/data.csv'] = content
+        downloads.download(self.url, self.path)
+
+        self.assertEqual(self.read(self.path), content)
+        self.assertEqual(self.server.requests[-1], ('GET', '/data.csv', None))
+
+    def test_download_missing_file(self):
+        with self.assertRaises(OSError):
+            downloads.download('{}/missing.csv'.format(self.server.url), self.path)
+
+        self.assertEqual(os.listdir(self.dir), [])
+
+    @staticmethod
+    def read(path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,7 +7,7 @@ from pandas_datareader.data import DataReader
 from zipline.utils.cli import maybe_show_progress
 
 
-def yahoo_bundle(symbols):
+def yahoo_bundle(symbols, first_sid=0):
     """Create a data bundle ingest function from a set of symbols loaded from
     Yahoo.
 
@@ -15,6 +15,9 @@ def yahoo_bundle(symbols):
     ----------
     symbols : iterable[str]
         The ticker symbols to load data for.
+    first_sid : int, optional
+        The sid of the first symbol, used to keep the sids apart from the
+        ones of other bundles.
 
     Returns
     -------
@@ -38,7 +41,8 @@ def yahoo_bundle(symbols):
 
     Notes
     -----
-    The sids for each symbol will be the index into the symbols sequence.
+    The sids for each symbol will be ``first_sid`` plus the index into the
+    symbols sequence.
     """
 
     # strict this in memory so that we can reiterate over it
@@ -64,10 +68,10 @@ def yahoo_bundle(symbols):
             ('end_date', 'datetime64[ns]'),
             ('auto_close_date', 'datetime64[ns]'),
             ('symbol', 'object'),
-        ]))
+        ]), index=np.arange(first_sid, first_sid + len(symbols)))
 
         def _pricing_iter():
-            sid = 0
+            i = 0
             with maybe_show_progress(
                     symbols,
                     show_progress,
@@ -92,7 +96,7 @@ def yahoo_bundle(symbols):
                     end_date = df.index[-1]
                     # The auto_close date is the day after the last trade.
                     ac_date = end_date + pd.Timedelta(days=1)
-                    metadata.iloc[sid] = start_date, end_date, ac_date, ticker
+                    metadata.iloc[i] = start_date, end_date, ac_date, ticker
 
                     df.rename(
                         columns={
@@ -105,8 +109,8 @@ def yahoo_bundle(symbols):
                         },
                         inplace=True,
                     )
-                    yield sid, df
-                    sid += 1
+                    yield first_sid + i, df
+                    i += 1
 
         daily_bar_writer.write(_pricing_iter(), show_progress=True)
 